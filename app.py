@@ -1,13 +1,21 @@
+import atexit
+import hashlib
 import json
+import multiprocessing
 import os
 import random
+import signal
+import socket
 import sqlite3
 import subprocess
+import sys
 import threading
 import time
 import urllib.error
 import urllib.request
+import uuid
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from shlex import split as shlex_split
 from urllib.parse import urlparse
 
@@ -23,9 +31,45 @@ from flask import (
 )
 from flask_sock import Sock
 
+from compare_history import compact_history, record_history, target_timeline
+from compare_schedule import CompareSchedule, jittered, spread_offset
 from compare_utils import DEFAULT_COMPARE_ENDPOINTS, compare_endpoints
-from form_filler import generate_entry_text, run_fill_session
+from fill_traces import (
+    FillTrace,
+    cycle_stats,
+    list_fill_traces,
+    prune_fill_traces,
+    recent_cycles,
+    record_fill_trace,
+)
+from form_filler import (
+    FillPlan,
+    configure_driver_pool,
+    generate_entry_text,
+    run_fill_session,
+    warm_driver_available,
+)
+from http_replay import ReplayError, build_replay_plan, replay_plan
+from job_queue import (
+    PRIORITY_PERIODIC,
+    PRIORITY_SUBMISSION,
+    PermanentJobError,
+    batch_failed,
+    batch_pending,
+    claim_job,
+    complete_job,
+    enqueue_job,
+    extend_job,
+    fail_job,
+    prune_jobs,
+    queue_counts,
+    queued_batch,
+    release_job,
+    running_count,
+    starting_count,
+)
 from migrate_db import run as run_migrations
+from ws_hub import BroadcastHub
 
 
 DEFAULT_BASELINE_URL = (
@@ -2259,6 +2303,7 @@ def run_load_for_target(url, name, steps, duration_seconds):
 def run_load_loop():
     steps = parse_concurrency_steps(LOAD_CONCURRENCY_STEPS)
     while True:
+        wait_for_lease("load_loop")
         if not LOAD_TEST_ENABLED:
             time.sleep(max(5, LOAD_ROUND_PAUSE_SECONDS))
             continue
@@ -2279,25 +2324,88 @@ def run_load_loop():
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY", "lab1-default-secret")
 sock = Sock(app)
-clients = set()
-active_fill_lock = threading.Lock()
-fill_active = False
-db_lock = threading.Lock()
-automation_enabled = False
-automation_paused_at = None
-automation_total_paused_seconds = 0
-next_auto_fill_at = None
-next_auto_fill_entry_text = None
-next_auto_fill_seed = None
-last_auto_fill_wait_seconds = None
+hub = BroadcastHub(
+    max_queue=int(os.environ.get("WS_CLIENT_QUEUE_SIZE", "256")),
+    policy=os.environ.get("WS_SLOW_CLIENT_POLICY", "drop_oldest").lower(),
+    batch_ms=int(os.environ.get("WS_LOG_BATCH_MS", "250")),
+    batch_lines=int(os.environ.get("WS_LOG_BATCH_LINES", "50")),
+)
+db_write_lock = threading.Lock()
+leaderboard_pending = []
+leaderboard_pending_lock = threading.Lock()
+settings_cache = {}
+settings_cache_version = None
+settings_cache_checked_at = 0
+settings_cache_lock = threading.Lock()
+last_history_compact_at = 0
+last_job_prune_at = 0
+response_cache = {}
+response_cache_lock = threading.Lock()
+relay_pending = []
+relay_pending_lock = threading.Lock()
+last_relay_prune_at = 0
+held_leases = {}
+held_leases_lock = threading.Lock()
 
 FILL_INTERVAL_SECONDS = int(os.environ.get("FILL_INTERVAL_SECONDS", "120"))
 AUTO_INTERVAL_MIN_SECONDS = int(os.environ.get("AUTO_INTERVAL_MIN_SECONDS", "10"))
 AUTO_INTERVAL_MAX_SECONDS = int(os.environ.get("AUTO_INTERVAL_MAX_SECONDS", "75"))
 COMPARE_INTERVAL_SECONDS = int(os.environ.get("COMPARE_INTERVAL_SECONDS", "150"))
+COMPARE_MIN_INTERVAL_SECONDS = int(
+    os.environ.get("COMPARE_MIN_INTERVAL_SECONDS", str(COMPARE_INTERVAL_SECONDS))
+)
+COMPARE_MAX_INTERVAL_SECONDS = int(os.environ.get("COMPARE_MAX_INTERVAL_SECONDS", "600"))
+COMPARE_RESULT_POLL_SECONDS = float(os.environ.get("COMPARE_RESULT_POLL_SECONDS", "5"))
+SCHEDULE_JITTER_RATIO = float(os.environ.get("SCHEDULE_JITTER_RATIO", "0.1"))
+FILL_SPREAD_SECONDS = int(os.environ.get("FILL_SPREAD_SECONDS", "30"))
 FILL_ITERATIONS = int(os.environ.get("FILL_ITERATIONS", "1"))
 FILL_MODE = os.environ.get("FILL_MODE", "all")
+FILL_ENGINE = os.environ.get("FILL_ENGINE", "browser").lower()
 DB_PATH = os.environ.get("DB_PATH", "app.db")
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", "5000"))
+LEADERBOARD_FLUSH_MS = int(os.environ.get("LEADERBOARD_FLUSH_MS", "0"))
+SETTINGS_REVALIDATE_SECONDS = float(os.environ.get("SETTINGS_REVALIDATE_SECONDS", "0"))
+HISTORY_RAW_RETENTION_HOURS = int(os.environ.get("HISTORY_RAW_RETENTION_HOURS", "48"))
+HISTORY_HOURLY_RETENTION_DAYS = int(os.environ.get("HISTORY_HOURLY_RETENTION_DAYS", "30"))
+HISTORY_COMPACT_INTERVAL_SECONDS = int(os.environ.get("HISTORY_COMPACT_INTERVAL_SECONDS", "3600"))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", str(min(4, os.cpu_count() or 1))))
+JOB_VISIBILITY_SECONDS = int(os.environ.get("JOB_VISIBILITY_SECONDS", "120"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_DELAY_SECONDS = int(os.environ.get("JOB_RETRY_DELAY_SECONDS", "30"))
+JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", "1"))
+JOB_RETENTION_HOURS = int(os.environ.get("JOB_RETENTION_HOURS", "24"))
+JOB_FLUSH_MS = int(os.environ.get("JOB_FLUSH_MS", str(LEADERBOARD_FLUSH_MS or 1000)))
+FILL_TRACE_RETENTION_HOURS = int(os.environ.get("FILL_TRACE_RETENTION_HOURS", "72"))
+DRIVER_POOL_SIZE = int(os.environ.get("DRIVER_POOL_SIZE", "1"))
+DRIVER_MAX_USES = int(os.environ.get("DRIVER_MAX_USES", "25"))
+FILL_CONCURRENCY = int(os.environ.get("FILL_CONCURRENCY", str(max(1, JOB_WORKERS))))
+FILL_BROWSER_MEMORY_MB = int(os.environ.get("FILL_BROWSER_MEMORY_MB", "400"))
+FILL_STARTUP_SECONDS = float(os.environ.get("FILL_STARTUP_SECONDS", "30"))
+SERVE_MODE = os.environ.get("SERVE_MODE", "dev").lower()
+INSTANCE_ID = os.environ.get("INSTANCE_ID") or (
+    f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+)
+SCHEDULER_LEASE_SECONDS = float(os.environ.get("SCHEDULER_LEASE_SECONDS", "30"))
+EVENT_RELAY = os.environ.get("EVENT_RELAY", "false").lower() == "true"
+EVENT_RELAY_INTERVAL_MS = int(os.environ.get("EVENT_RELAY_INTERVAL_MS", "200"))
+EVENT_RELAY_RETENTION_SECONDS = int(os.environ.get("EVENT_RELAY_RETENTION_SECONDS", "60"))
+WEB_WORKERS = int(os.environ.get("WEB_WORKERS", str(min(8, (os.cpu_count() or 1) * 2 + 1))))
+WEB_THREADS = int(os.environ.get("WEB_THREADS", "32"))
+WEB_MAX_CONNECTIONS = int(os.environ.get("WEB_MAX_CONNECTIONS", "1000"))
+WEB_KEEPALIVE_SECONDS = int(os.environ.get("WEB_KEEPALIVE_SECONDS", "5"))
+WEB_TIMEOUT_SECONDS = int(os.environ.get("WEB_TIMEOUT_SECONDS", "60"))
+WEB_BACKLOG = int(os.environ.get("WEB_BACKLOG", "2048"))
+SETTING_TYPES = {
+    "baseline_url": str,
+    "automation_enabled": bool,
+    "automation_paused_at": int,
+    "automation_total_paused_seconds": int,
+    "auto_interval_min_seconds": int,
+    "auto_interval_max_seconds": int,
+    "next_auto_fill_at": float,
+    "next_auto_fill_seed": int,
+    "next_auto_fill_entry_text": str,
+}
 ADMIN_USERNAME = os.environ.get("ADMIN_USERNAME", "admin")
 ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "lab1admin")
 LOAD_TEST_ENABLED = os.environ.get("LOAD_TEST_ENABLED", "false").lower() == "true"
@@ -2395,6 +2503,13 @@ def healthz():
     return jsonify({"status": "ok"})
 
 
+@app.get("/api/ws/stats")
+def ws_stats():
+    # Each web worker has its own hub, so these are the counts of whichever
+    # worker answered; the pid tells repeated requests apart.
+    return jsonify({"scope": "worker", "pid": os.getpid(), **hub.stats()})
+
+
 @app.route("/admin", methods=["GET", "POST"])
 def admin_login():
     if request.method == "POST":
@@ -2416,91 +2531,153 @@ def admin_panel():
     if not lab:
         lab = get_lab(DEFAULT_LAB_ID)
         lab_id = lab["id"]
-    paused_seconds = automation_total_paused_seconds
-    if automation_paused_at is not None:
-        paused_seconds += int(time.time() - automation_paused_at)
+    paused_at = get_setting("automation_paused_at")
+    paused_seconds = get_setting("automation_total_paused_seconds", 0)
+    if paused_at is not None:
+        paused_seconds += int(time.time() - paused_at)
+    next_fill_at = get_setting("next_auto_fill_at")
     next_fill_in = None
-    if next_auto_fill_at is not None:
-        next_fill_in = max(0, int(next_auto_fill_at - time.time()))
+    if next_fill_at is not None:
+        next_fill_in = max(0, int(next_fill_at - time.time()))
+    interval_min, interval_max = auto_interval_bounds()
     return render_template(
         "admin_panel.html",
         lab=lab,
         labs=list_labs(),
-        automation_enabled=automation_enabled,
-        auto_interval_min=AUTO_INTERVAL_MIN_SECONDS,
-        auto_interval_max=AUTO_INTERVAL_MAX_SECONDS,
+        automation_enabled=get_setting("automation_enabled", False),
+        auto_interval_min=interval_min,
+        auto_interval_max=interval_max,
         teams=list_teams(lab_id),
         submissions=list_students(lab_id),
         automation_paused_seconds=paused_seconds,
         next_fill_in_seconds=next_fill_in,
-        next_fill_entry_text=next_auto_fill_entry_text,
+        next_fill_entry_text=get_setting("next_auto_fill_entry_text"),
         baseline_url=get_setting("baseline_url", DEFAULT_BASELINE_URL),
     )
 
 
 @app.post("/admin/toggle")
 def admin_toggle():
-    global automation_enabled, automation_paused_at, automation_total_paused_seconds
-    global next_auto_fill_at, next_auto_fill_entry_text, next_auto_fill_seed
     if not session.get("admin"):
         return redirect(url_for("admin_login"))
     lab_id = (request.form.get("lab") or DEFAULT_LAB_ID).strip().lower()
     if not get_lab(lab_id):
         lab_id = DEFAULT_LAB_ID
-    automation_enabled = not automation_enabled
+    enabled = not get_setting("automation_enabled", False)
     now = int(time.time())
-    if not automation_enabled:
-        automation_paused_at = now
-        next_auto_fill_at = None
-        next_auto_fill_entry_text = None
-        next_auto_fill_seed = None
+    if not enabled:
+        set_settings(
+            {
+                "automation_enabled": False,
+                "automation_paused_at": now,
+                "next_auto_fill_at": None,
+                "next_auto_fill_entry_text": None,
+                "next_auto_fill_seed": None,
+            }
+        )
         broadcast_fill_meta()
-        broadcast("fill_log", {"message": f"Automation paused at {time.ctime(now)}."})
+        broadcast(
+            "fill_log",
+            {"message": f"Automation paused at {time.ctime(now)}."},
+            lab=AUTOMATION_LAB_ID,
+        )
     else:
-        if automation_paused_at is not None:
-            paused_for = now - automation_paused_at
-            automation_total_paused_seconds += paused_for
+        paused_at = get_setting("automation_paused_at")
+        total_paused = get_setting("automation_total_paused_seconds", 0)
+        if paused_at is not None:
+            paused_for = now - paused_at
+            total_paused += paused_for
             broadcast(
                 "fill_log",
                 {
                     "message": (
                         f"Automation resumed after {paused_for}s paused "
-                        f"(total paused {automation_total_paused_seconds}s)."
+                        f"(total paused {total_paused}s)."
                     )
                 },
+                lab=AUTOMATION_LAB_ID,
             )
-        automation_paused_at = None
+        set_settings(
+            {
+                "automation_enabled": True,
+                "automation_paused_at": None,
+                "automation_total_paused_seconds": total_paused,
+            }
+        )
         broadcast_fill_meta()
     return redirect(url_for("admin_panel", lab=lab_id))
 
 
+def auto_interval_bounds():
+    return (
+        get_setting("auto_interval_min_seconds", AUTO_INTERVAL_MIN_SECONDS),
+        get_setting("auto_interval_max_seconds", AUTO_INTERVAL_MAX_SECONDS),
+    )
+
+
+def random_auto_interval():
+    return random.randint(*auto_interval_bounds())
+
+
+def schedule_next_auto_fill(wait_seconds):
+    next_at = time.time() + wait_seconds
+    seed = int(next_at)
+    set_settings(
+        {
+            "next_auto_fill_at": next_at,
+            "next_auto_fill_seed": seed,
+            "next_auto_fill_entry_text": generate_entry_text("local", seed=seed),
+        }
+    )
+    broadcast_fill_meta()
+
+
+def clear_next_auto_fill():
+    if (
+        get_setting("next_auto_fill_at") is None
+        and get_setting("next_auto_fill_seed") is None
+        and get_setting("next_auto_fill_entry_text") is None
+    ):
+        return
+    set_settings(
+        {
+            "next_auto_fill_at": None,
+            "next_auto_fill_seed": None,
+            "next_auto_fill_entry_text": None,
+        }
+    )
+
+
 def broadcast_fill_meta():
-    if not automation_enabled:
+    if not get_setting("automation_enabled", False):
         broadcast(
             "fill_meta",
             {"next_in_seconds": None, "entry_text": None, "status": "paused"},
+            lab=AUTOMATION_LAB_ID,
         )
         return
-    if next_auto_fill_at is None:
+    next_fill_at = get_setting("next_auto_fill_at")
+    if next_fill_at is None:
         broadcast(
             "fill_meta",
             {"next_in_seconds": None, "entry_text": None, "status": "pending"},
+            lab=AUTOMATION_LAB_ID,
         )
         return
-    next_in = max(0, int(next_auto_fill_at - time.time()))
+    next_in = max(0, int(next_fill_at - time.time()))
     broadcast(
         "fill_meta",
         {
             "next_in_seconds": next_in,
-            "entry_text": next_auto_fill_entry_text,
+            "entry_text": get_setting("next_auto_fill_entry_text"),
             "status": "scheduled",
         },
+        lab=AUTOMATION_LAB_ID,
     )
 
 
 @app.post("/admin/interval")
 def admin_interval_update():
-    global AUTO_INTERVAL_MIN_SECONDS, AUTO_INTERVAL_MAX_SECONDS
     if not session.get("admin"):
         return redirect(url_for("admin_login"))
     lab_id = (request.form.get("lab") or DEFAULT_LAB_ID).strip().lower()
@@ -2515,8 +2692,12 @@ def admin_interval_update():
         return redirect(url_for("admin_panel", lab=lab_id))
     if min_seconds < 1 or max_seconds < 1 or min_seconds > max_seconds:
         return redirect(url_for("admin_panel", lab=lab_id))
-    AUTO_INTERVAL_MIN_SECONDS = min_seconds
-    AUTO_INTERVAL_MAX_SECONDS = max_seconds
+    set_settings(
+        {
+            "auto_interval_min_seconds": min_seconds,
+            "auto_interval_max_seconds": max_seconds,
+        }
+    )
     return redirect(url_for("admin_panel", lab=lab_id))
 
 
@@ -2596,297 +2777,479 @@ def admin_logout():
 
 
 def get_db():
-    conn = sqlite3.connect(DB_PATH, timeout=5)
+    conn = sqlite3.connect(DB_PATH, timeout=DB_BUSY_TIMEOUT_MS / 1000)
     conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA synchronous = NORMAL")
     return conn
 
 
-def get_setting(key, fallback=None):
-    with db_lock:
-        conn = get_db()
-        try:
-            row = conn.execute(
-                "SELECT value FROM settings WHERE key = ?",
-                (key,),
-            ).fetchone()
-        finally:
-            conn.close()
-    return row["value"] if row else fallback
+@contextmanager
+def read_db():
+    conn = get_db()
+    try:
+        yield conn
+    finally:
+        conn.close()
 
 
-def set_setting(key, value):
-    now = int(time.time())
-    with db_lock:
+@contextmanager
+def write_db():
+    # All writes funnel through here: one writer per process, and BEGIN IMMEDIATE
+    # takes the SQLite write lock up front so other processes wait on busy_timeout
+    # instead of failing mid-transaction. Readers never block on this.
+    with db_write_lock:
         conn = get_db()
         try:
-            conn.execute(
-                """
-                INSERT INTO settings (key, value, updated_at)
-                VALUES (?, ?, ?)
-                ON CONFLICT(key) DO UPDATE SET
-                    value=excluded.value,
-                    updated_at=excluded.updated_at
-                """,
-                (key, value, now),
-            )
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
             conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
         finally:
             conn.close()
 
 
+def parse_setting(key, raw_value):
+    if raw_value is None or raw_value == "":
+        return None
+    cast = SETTING_TYPES.get(key, str)
+    if cast is bool:
+        return str(raw_value).strip().lower() in {"1", "true", "yes", "on"}
+    try:
+        return cast(raw_value)
+    except (TypeError, ValueError):
+        return None
+
+
+def serialize_setting(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return str(value)
+
+
+def read_data_version(conn, name):
+    row = conn.execute(
+        "SELECT version FROM data_versions WHERE name = ?",
+        (name,),
+    ).fetchone()
+    return row["version"] if row else 0
+
+
+def load_settings_cache():
+    global settings_cache, settings_cache_version, settings_cache_checked_at
+    with read_db() as conn:
+        rows = conn.execute("SELECT key, value FROM settings").fetchall()
+        version = read_data_version(conn, "settings")
+    values = {row["key"]: parse_setting(row["key"], row["value"]) for row in rows}
+    with settings_cache_lock:
+        settings_cache = values
+        settings_cache_version = version
+        settings_cache_checked_at = time.time()
+
+
+def revalidate_settings_cache():
+    global settings_cache_checked_at
+    if settings_cache_version is None:
+        load_settings_cache()
+        return
+    if SETTINGS_REVALIDATE_SECONDS <= 0:
+        return
+    if time.time() - settings_cache_checked_at < SETTINGS_REVALIDATE_SECONDS:
+        return
+    with read_db() as conn:
+        version = read_data_version(conn, "settings")
+    if version != settings_cache_version:
+        load_settings_cache()
+        return
+    settings_cache_checked_at = time.time()
+
+
+def get_setting(key, fallback=None):
+    revalidate_settings_cache()
+    value = settings_cache.get(key)
+    return fallback if value is None else value
+
+
+def set_settings(values):
+    global settings_cache_version
+    now = int(time.time())
+    raw_values = {key: serialize_setting(value) for key, value in values.items()}
+    with write_db() as conn:
+        conn.executemany(
+            """
+            INSERT INTO settings (key, value, updated_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                value=excluded.value,
+                updated_at=excluded.updated_at
+            """,
+            [(key, raw_value, now) for key, raw_value in raw_values.items()],
+        )
+        version = read_data_version(conn, "settings")
+    with settings_cache_lock:
+        stale = (
+            settings_cache_version is None
+            or version != settings_cache_version + len(raw_values)
+        )
+        if not stale:
+            for key, raw_value in raw_values.items():
+                settings_cache[key] = parse_setting(key, raw_value)
+            settings_cache_version = version
+    if stale:
+        # Another process wrote settings since our last load; pick those up too.
+        load_settings_cache()
+
+
+def set_setting(key, value):
+    set_settings({key: value})
+
+
 def init_db():
     run_migrations()
-    with db_lock:
-        conn = get_db()
-        try:
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS students (
-                    lab TEXT NOT NULL,
-                    url TEXT NOT NULL,
-                    name TEXT NOT NULL,
-                    added_at INTEGER NOT NULL,
-                    PRIMARY KEY (lab, url)
-                )
-                """
+    conn = get_db()
+    try:
+        conn.execute("PRAGMA journal_mode = WAL")
+    finally:
+        conn.close()
+    load_settings_cache()
+    with write_db() as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS students (
+                lab TEXT NOT NULL,
+                url TEXT NOT NULL,
+                name TEXT NOT NULL,
+                added_at INTEGER NOT NULL,
+                PRIMARY KEY (lab, url)
             )
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS leaderboard (
-                    lab TEXT NOT NULL,
-                    url TEXT NOT NULL,
-                    name TEXT NOT NULL,
-                    last_checked INTEGER,
-                    sync INTEGER,
-                    PRIMARY KEY (lab, url)
-                )
-                """
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS leaderboard (
+                lab TEXT NOT NULL,
+                url TEXT NOT NULL,
+                name TEXT NOT NULL,
+                last_checked INTEGER,
+                sync INTEGER,
+                PRIMARY KEY (lab, url)
             )
-            conn.commit()
-        finally:
-            conn.close()
+            """
+        )
 
 
 def list_teams(lab=None):
-    with db_lock:
-        conn = get_db()
-        try:
-            if lab:
-                rows = conn.execute(
-                    """
-                    SELECT id, lab, name, members, updated_at
-                    FROM teams
-                    WHERE lab = ?
-                    ORDER BY name ASC
-                    """,
-                    (lab,),
-                ).fetchall()
-            else:
-                rows = conn.execute(
-                    """
-                    SELECT id, lab, name, members, updated_at
-                    FROM teams
-                    ORDER BY lab ASC, name ASC
-                    """
-                ).fetchall()
-        finally:
-            conn.close()
+    with read_db() as conn:
+        if lab:
+            rows = conn.execute(
+                """
+                SELECT id, lab, name, members, updated_at
+                FROM teams
+                WHERE lab = ?
+                ORDER BY name ASC
+                """,
+                (lab,),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                """
+                SELECT id, lab, name, members, updated_at
+                FROM teams
+                ORDER BY lab ASC, name ASC
+                """
+            ).fetchall()
     return [dict(row) for row in rows]
 
 
 def create_team(lab, name, members):
     now = int(time.time())
-    with db_lock:
-        conn = get_db()
-        try:
-            conn.execute(
-                """
-                INSERT INTO teams (lab, name, members, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?)
-                """,
-                (lab, name, members, now, now),
-            )
-            conn.commit()
-        finally:
-            conn.close()
+    with write_db() as conn:
+        conn.execute(
+            """
+            INSERT INTO teams (lab, name, members, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (lab, name, members, now, now),
+        )
 
 
 def update_team(team_id, lab, name, members):
     now = int(time.time())
-    with db_lock:
-        conn = get_db()
-        try:
-            conn.execute(
-                """
-                UPDATE teams
-                SET lab = ?, name = ?, members = ?, updated_at = ?
-                WHERE id = ?
-                """,
-                (lab, name, members, now, team_id),
-            )
-            conn.commit()
-        finally:
-            conn.close()
+    with write_db() as conn:
+        conn.execute(
+            """
+            UPDATE teams
+            SET lab = ?, name = ?, members = ?, updated_at = ?
+            WHERE id = ?
+            """,
+            (lab, name, members, now, team_id),
+        )
 
 
 def delete_team(team_id):
-    with db_lock:
-        conn = get_db()
-        try:
-            conn.execute("DELETE FROM teams WHERE id = ?", (team_id,))
-            conn.commit()
-        finally:
-            conn.close()
+    with write_db() as conn:
+        conn.execute("DELETE FROM teams WHERE id = ?", (team_id,))
 
 
 def upsert_student(lab_id, name, url):
     now = int(time.time())
-    with db_lock:
-        conn = get_db()
-        try:
-            conn.execute(
-                """
-                INSERT INTO students (lab, url, name, added_at)
-                VALUES (?, ?, ?, ?)
-                ON CONFLICT(lab, url) DO UPDATE SET
-                    name=excluded.name,
-                    added_at=excluded.added_at
-                """,
-                (lab_id, url, name, now),
-            )
-            conn.commit()
-        finally:
-            conn.close()
+    with write_db() as conn:
+        conn.execute(
+            """
+            INSERT INTO students (lab, url, name, added_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(lab, url) DO UPDATE SET
+                name=excluded.name,
+                added_at=excluded.added_at
+            """,
+            (lab_id, url, name, now),
+        )
+    broadcast(
+        "students_delta",
+        {"lab": lab_id, "upsert": [{"lab": lab_id, "name": name, "url": url, "added_at": now}]},
+        lab=lab_id,
+    )
 
 
 def list_students(lab_id=None):
-    with db_lock:
-        conn = get_db()
-        try:
-            if lab_id:
-                rows = conn.execute(
-                    """
-                    SELECT lab, name, url, added_at
-                    FROM students
-                    WHERE lab = ?
-                    ORDER BY added_at DESC
-                    """,
-                    (lab_id,),
-                ).fetchall()
-            else:
-                rows = conn.execute(
-                    """
-                    SELECT lab, name, url, added_at
-                    FROM students
-                    ORDER BY added_at DESC
-                    """
-                ).fetchall()
-        finally:
-            conn.close()
+    with read_db() as conn:
+        if lab_id:
+            rows = conn.execute(
+                """
+                SELECT lab, name, url, added_at
+                FROM students
+                WHERE lab = ?
+                ORDER BY added_at DESC
+                """,
+                (lab_id,),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                """
+                SELECT lab, name, url, added_at
+                FROM students
+                ORDER BY added_at DESC
+                """
+            ).fetchall()
     return [dict(row) for row in rows]
 
 
 def ensure_leaderboard_entry(lab_id, target_url, name):
-    with db_lock:
-        conn = get_db()
-        try:
-            conn.execute(
-                """
-                INSERT INTO leaderboard (lab, url, name, last_checked, sync)
-                VALUES (?, ?, ?, NULL, NULL)
-                ON CONFLICT(lab, url) DO UPDATE SET
-                    name=excluded.name
-                """,
-                (lab_id, target_url, name),
-            )
-            conn.commit()
-        finally:
-            conn.close()
+    with write_db() as conn:
+        row = conn.execute(
+            """
+            INSERT INTO leaderboard (lab, url, name, last_checked, sync)
+            VALUES (?, ?, ?, NULL, NULL)
+            ON CONFLICT(lab, url) DO UPDATE SET
+                name=excluded.name
+            RETURNING lab, name, url, last_checked, sync
+            """,
+            (lab_id, target_url, name),
+        ).fetchone()
+    broadcast("leaderboard_delta", {"lab": lab_id, "upsert": [leaderboard_item(row)]}, lab=lab_id)
 
 
 def delete_submission(lab_id, target_url):
-    with db_lock:
-        conn = get_db()
-        try:
-            conn.execute(
-                "DELETE FROM students WHERE lab = ? AND url = ?",
-                (lab_id, target_url),
-            )
-            conn.execute(
-                "DELETE FROM leaderboard WHERE lab = ? AND url = ?",
-                (lab_id, target_url),
-            )
-            conn.commit()
-        finally:
-            conn.close()
+    with write_db() as conn:
+        conn.execute(
+            "DELETE FROM students WHERE lab = ? AND url = ?",
+            (lab_id, target_url),
+        )
+        conn.execute(
+            "DELETE FROM leaderboard WHERE lab = ? AND url = ?",
+            (lab_id, target_url),
+        )
+    broadcast("students_delta", {"lab": lab_id, "remove": [target_url]}, lab=lab_id)
+    broadcast("leaderboard_delta", {"lab": lab_id, "remove": [target_url]}, lab=lab_id)
+
+
+def leaderboard_entry(
+    lab_id, target_url, name, sync_status, checked_at=None, results=None, elapsed_ms=None
+):
+    return {
+        "lab": lab_id,
+        "url": target_url,
+        "name": name,
+        "sync": sync_status,
+        "checked_at": int(checked_at if checked_at is not None else time.time()),
+        "results": results,
+        "elapsed_ms": elapsed_ms,
+    }
+
+
+def update_leaderboard_many(entries):
+    if not entries:
+        return
+    rows = []
+    for entry in entries:
+        sync_status = entry["sync"]
+        sync_value = 1 if sync_status is True else 0 if sync_status is False else None
+        rows.append(
+            (entry["lab"], entry["url"], entry["name"], entry["checked_at"], sync_value)
+        )
+    with write_db() as conn:
+        conn.executemany(
+            """
+            INSERT INTO leaderboard (lab, url, name, last_checked, sync)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(lab, url) DO UPDATE SET
+                name=excluded.name,
+                last_checked=excluded.last_checked,
+                sync=excluded.sync
+            """,
+            rows,
+        )
+        record_history(conn, entries)
+    deltas = {}
+    for lab_id, url, name, last_checked, sync_value in rows:
+        deltas.setdefault(lab_id, {})[url] = leaderboard_item(
+            {
+                "lab": lab_id,
+                "name": name,
+                "url": url,
+                "last_checked": last_checked,
+                "sync": sync_value,
+            }
+        )
+    for lab_id, items in deltas.items():
+        broadcast("leaderboard_delta", {"lab": lab_id, "upsert": list(items.values())}, lab=lab_id)
 
 
-def update_leaderboard(lab_id, target_url, name, sync_status):
-    now = int(time.time())
-    sync_value = 1 if sync_status is True else 0 if sync_status is False else None
-    with db_lock:
-        conn = get_db()
-        try:
-            conn.execute(
-                """
-                INSERT INTO leaderboard (lab, url, name, last_checked, sync)
-                VALUES (?, ?, ?, ?, ?)
-                ON CONFLICT(lab, url) DO UPDATE SET
-                    name=excluded.name,
-                    last_checked=excluded.last_checked,
-                    sync=excluded.sync
-                """,
-                (lab_id, target_url, name, now, sync_value),
+def update_leaderboard(lab_id, target_url, name, sync_status, results=None, elapsed_ms=None):
+    update_leaderboard_many(
+        [
+            leaderboard_entry(
+                lab_id, target_url, name, sync_status, results=results, elapsed_ms=elapsed_ms
             )
-            conn.commit()
-        finally:
-            conn.close()
+        ]
+    )
 
 
-def list_leaderboard(lab_id=None):
-    with db_lock:
-        conn = get_db()
-        try:
-            if lab_id:
-                rows = conn.execute(
-                    """
-                    SELECT lab, name, url, last_checked, sync
-                    FROM leaderboard
-                    WHERE lab = ?
-                    ORDER BY COALESCE(last_checked, 0) DESC
-                    """,
-                    (lab_id,),
-                ).fetchall()
-            else:
-                rows = conn.execute(
-                    """
-                    SELECT lab, name, url, last_checked, sync
-                    FROM leaderboard
-                    ORDER BY COALESCE(last_checked, 0) DESC
-                    """
-                ).fetchall()
-        finally:
-            conn.close()
-    items = []
-    for row in rows:
-        sync_value = None
-        if row["sync"] is not None:
-            sync_value = bool(row["sync"])
-        items.append(
-            {
-                "lab": row["lab"],
-                "name": row["name"],
-                "url": row["url"],
-                "last_checked": row["last_checked"],
-                "sync": sync_value,
-            }
+def queue_leaderboard_update(entry):
+    with leaderboard_pending_lock:
+        leaderboard_pending.append(entry)
+
+
+def flush_leaderboard_updates():
+    with leaderboard_pending_lock:
+        if not leaderboard_pending:
+            return 0
+        entries = list(leaderboard_pending)
+        leaderboard_pending.clear()
+    try:
+        update_leaderboard_many(entries)
+    except sqlite3.Error as exc:
+        with leaderboard_pending_lock:
+            leaderboard_pending[:0] = entries
+        print(f"[db] leaderboard flush of {len(entries)} row(s) failed: {exc}", flush=True)
+        return 0
+    return len(entries)
+
+
+def compact_compare_history():
+    global last_history_compact_at
+    now = time.time()
+    if now - last_history_compact_at < HISTORY_COMPACT_INTERVAL_SECONDS:
+        return
+    last_history_compact_at = now
+    with write_db() as conn:
+        downsampled, expired = compact_history(
+            conn,
+            now,
+            HISTORY_RAW_RETENTION_HOURS * 3600,
+            HISTORY_HOURLY_RETENTION_DAYS * 86400,
+        )
+    if downsampled or expired:
+        print(
+            f"[db] compare history: downsampled {downsampled} row(s), "
+            f"expired {expired} hourly bucket(s)",
+            flush=True,
         )
-    return items
+
+
+def get_compare_history(lab_id, target_url, since, until):
+    with read_db() as conn:
+        return target_timeline(conn, lab_id, target_url, since, until)
+
+
+def run_leaderboard_flush_loop(interval_ms=LEADERBOARD_FLUSH_MS):
+    while True:
+        time.sleep(interval_ms / 1000)
+        flush_leaderboard_updates()
+
+
+def start_job_result_flush():
+    # Job workers queue compare results and write them in one transaction
+    # per interval instead of one per job.
+    threading.Thread(
+        target=run_leaderboard_flush_loop, args=(JOB_FLUSH_MS,), daemon=True
+    ).start()
+
+
+def leaderboard_item(row):
+    sync_value = None
+    if row["sync"] is not None:
+        sync_value = bool(row["sync"])
+    return {
+        "lab": row["lab"],
+        "name": row["name"],
+        "url": row["url"],
+        "last_checked": row["last_checked"],
+        "sync": sync_value,
+    }
+
+
+def list_leaderboard(lab_id=None):
+    with read_db() as conn:
+        if lab_id:
+            rows = conn.execute(
+                """
+                SELECT lab, name, url, last_checked, sync
+                FROM leaderboard
+                WHERE lab = ?
+                ORDER BY COALESCE(last_checked, 0) DESC
+                """,
+                (lab_id,),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                """
+                SELECT lab, name, url, last_checked, sync
+                FROM leaderboard
+                ORDER BY COALESCE(last_checked, 0) DESC
+                """
+            ).fetchall()
+    return [leaderboard_item(row) for row in rows]
+
+
+def cached_json_response(resource, lab_id, build):
+    # data_versions is bumped by triggers on every write to the table, so a
+    # single primary-key lookup tells us whether the cached body is still valid.
+    cache_key = f"{resource}:{lab_id}"
+    with read_db() as conn:
+        version = read_data_version(conn, cache_key)
+    cached = response_cache.get(cache_key)
+    if cached is None or cached[0] != version:
+        body = json.dumps(build(), separators=(",", ":"))
+        cached = (version, hashlib.sha1(body.encode("utf-8")).hexdigest(), body)
+        with response_cache_lock:
+            response_cache[cache_key] = cached
+    _version, etag, body = cached
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 
 @app.post("/api/compare")
 def compare():
-    global fill_active
     payload = request.get_json(silent=True) or {}
     name = (payload.get("name") or "").strip()
     target_url = (payload.get("url") or "").strip()
@@ -2924,28 +3287,37 @@ def compare():
     started_at = time.time()
     ok, results = compare_endpoints(baseline_url, target_url, endpoints)
     elapsed_ms = int((time.time() - started_at) * 1000)
-    update_leaderboard(lab_id, target_url, name, ok)
-
-    with active_fill_lock:
-        if not fill_active:
-            fill_active = True
-            shared_seed = int(time.time())
-            job_payload = {
-                "url": target_url,
+    update_leaderboard(lab_id, target_url, name, ok, results=results, elapsed_ms=elapsed_ms)
+
+    shared_seed = int(time.time())
+    dedup_key = f"fill_cycle:{lab_id}:{target_url}"
+    with write_db() as conn:
+        # A resubmission while the first fill is still waiting joins its
+        # batch, so the two merge into one fill instead of queueing twice.
+        enqueue_job(
+            conn,
+            "fill_cycle",
+            {
+                "lab": lab_id,
                 "baseline_url": baseline_url,
-                "iterations": 1,
-                "mode": FILL_MODE,
-                "min_wait": 1,
-                "max_wait": 2,
-                "headless": True,
                 "seed": shared_seed,
-                "entry_mode": "local",
                 "entry_text": generate_entry_text("local", seed=shared_seed),
-                "target_name": name,
-            }
-            broadcast("fill_start", {"message": f"New app detected. Filling {target_url}."})
-            thread = threading.Thread(target=run_fill_job, args=(job_payload,), daemon=True)
-            thread.start()
+                "iterations": 1,
+                "targets": [{"url": target_url, "name": name}],
+                "start_message": f"New app detected. Filling {target_url}.",
+                "done_message": "Form filling complete.",
+            },
+            time.time(),
+            priority=PRIORITY_SUBMISSION,
+            dedup_key=dedup_key,
+            batch=queued_batch(conn, dedup_key) or f"submit-{uuid.uuid4().hex[:12]}",
+            max_attempts=JOB_MAX_ATTEMPTS,
+        )
+    broadcast(
+        "fill_log",
+        {"message": f"New app detected. Queued a fill for {target_url}."},
+        lab=lab_id,
+    )
 
     return jsonify(
         {
@@ -2966,109 +3338,635 @@ def students():
     lab = get_lab(lab_id)
     if not lab:
         return jsonify({"error": "Unknown lab."}), 400
-    return jsonify({"students": list_students(lab_id)})
+    return cached_json_response("students", lab_id, lambda: {"students": list_students(lab_id)})
 
 
-def broadcast(event, payload):
-    message = json.dumps({"event": event, "payload": payload})
-    stale = []
-    for ws in clients:
+def broadcast(event, payload, lab=None):
+    if EVENT_RELAY:
+        # Other processes own the websocket clients; hand the event to them
+        # through SQLite and let every web worker's relay reader publish it.
+        with relay_pending_lock:
+            relay_pending.append((time.time(), lab, event, json.dumps(payload)))
+        return
+    hub.publish(event, payload, lab=lab)
+
+
+def flush_relay_events():
+    global last_relay_prune_at
+    with relay_pending_lock:
+        if not relay_pending:
+            return 0
+        events = list(relay_pending)
+        relay_pending.clear()
+    now = time.time()
+    try:
+        with write_db() as conn:
+            conn.executemany(
+                "INSERT INTO ws_events (created_at, lab, event, payload) VALUES (?, ?, ?, ?)",
+                events,
+            )
+            if now - last_relay_prune_at >= EVENT_RELAY_RETENTION_SECONDS:
+                conn.execute(
+                    "DELETE FROM ws_events WHERE created_at < ?",
+                    (now - EVENT_RELAY_RETENTION_SECONDS,),
+                )
+                last_relay_prune_at = now
+    except sqlite3.Error as exc:
+        with relay_pending_lock:
+            relay_pending[:0] = events
+        print(f"[relay] flush of {len(events)} event(s) failed: {exc}", flush=True)
+        return 0
+    return len(events)
+
+
+def run_event_relay_writer():
+    while True:
+        time.sleep(EVENT_RELAY_INTERVAL_MS / 1000)
+        flush_relay_events()
+
+
+def run_event_relay_reader():
+    with read_db() as conn:
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM ws_events").fetchone()[0]
+    while True:
+        time.sleep(EVENT_RELAY_INTERVAL_MS / 1000)
         try:
-            ws.send(message)
-        except Exception:
-            stale.append(ws)
-    for ws in stale:
-        clients.discard(ws)
+            with read_db() as conn:
+                rows = conn.execute(
+                    """
+                    SELECT id, lab, event, payload
+                    FROM ws_events
+                    WHERE id > ?
+                    ORDER BY id ASC
+                    LIMIT 1000
+                    """,
+                    (last_id,),
+                ).fetchall()
+        except sqlite3.Error as exc:
+            print(f"[relay] read failed: {exc}", flush=True)
+            continue
+        for row in rows:
+            last_id = row["id"]
+            hub.publish(row["event"], json.loads(row["payload"]), lab=row["lab"])
+
+
+def start_event_relay(reader=False):
+    threading.Thread(target=run_event_relay_writer, daemon=True).start()
+    if reader:
+        threading.Thread(target=run_event_relay_reader, daemon=True).start()
 
 
 @sock.route("/ws")
 def ws_handler(ws):
-    clients.add(ws)
+    hub.add(ws)
     try:
-        while ws.receive() is not None:
-            pass
+        while True:
+            message = ws.receive()
+            if message is None:
+                break
+            hub.handle_message(ws, message)
     finally:
-        clients.discard(ws)
+        hub.remove(ws)
+
+
+def submit_job(kind, payload, **options):
+    options.setdefault("max_attempts", JOB_MAX_ATTEMPTS)
+    with write_db() as conn:
+        return enqueue_job(conn, kind, payload, time.time(), **options)
 
 
-def run_fill_job(payload):
-    global fill_active
+def save_fill_trace(lab_id, batch, url, label, engine, trace, error=None):
+    # Timing data only: losing a trace must not fail the fill it describes.
     try:
-        baseline_url = payload.get("baseline_url")
-        entry_text = payload.get("entry_text")
-        if baseline_url:
-            if entry_text:
-                broadcast(
-                    "fill_log",
-                    {"message": f"[baseline] entry: {entry_text}"},
-                )
-            try:
-                run_fill_session(
-                    url=baseline_url,
-                    mode=payload["mode"],
-                    iterations=payload["iterations"],
-                    min_wait=payload["min_wait"],
-                    max_wait=payload["max_wait"],
-                    headless=payload["headless"],
-                    seed=payload["seed"],
-                    entry_mode=payload["entry_mode"],
-                    entry_text=entry_text,
-                    log_cb=lambda message: broadcast(
-                        "fill_log", {"message": f"[baseline] {message}"}
-                    ),
-                )
-            except Exception as exc:
-                broadcast(
-                    "fill_error",
-                    {"message": f"Auto-fill failed for baseline ({baseline_url}): {exc}"},
-                )
-                return
+        with write_db() as conn:
+            record_fill_trace(conn, lab_id, batch, url, label, engine, trace, error)
+    except sqlite3.Error as exc:
+        print(f"[fill] could not save trace for {url}: {exc}", flush=True)
+
+
+def fill_one(payload, url, label, capture_requests=False, fill_plan=None, batch=None):
+    lab_id = payload.get("lab")
+    entry_text = payload.get("entry_text")
+    if fill_plan is None and payload.get("fill_plan"):
+        fill_plan = FillPlan.from_dict(payload["fill_plan"])
+    trace = FillTrace()
+    if entry_text:
+        broadcast("fill_log", {"message": f"[{label}] entry: {entry_text}"}, lab=lab_id)
+    try:
+        recorded = run_fill_session(
+            url=url,
+            mode=payload.get("mode", FILL_MODE),
+            iterations=payload.get("iterations", FILL_ITERATIONS),
+            min_wait=1,
+            max_wait=2,
+            headless=True,
+            seed=payload["seed"],
+            entry_mode="local",
+            entry_text=entry_text,
+            log_cb=lambda message: broadcast(
+                "fill_log",
+                {"message": f"[{label}] {message}"},
+                lab=lab_id,
+            ),
+            capture_requests=capture_requests,
+            fill_plan=fill_plan,
+            trace=trace,
+        )
+    except Exception as exc:
+        save_fill_trace(lab_id, batch, url, label, "browser", trace, str(exc))
+        broadcast(
+            "fill_error",
+            {"message": f"Auto-fill failed for {label} ({url}): {exc}"},
+            lab=lab_id,
+        )
+        # Form posts aren't idempotent: once anything was submitted, a retry
+        # would enter the same data twice and break baseline/target parity.
+        if any(span["name"] == "submit" for span in trace.spans):
+            raise PermanentJobError(f"failed after submitting: {exc}") from exc
+        raise
+    save_fill_trace(lab_id, batch, url, label, "browser", trace)
+    broadcast("fill_log", {"message": f"[{label}] fill completed for {url}"}, lab=lab_id)
+    return recorded
+
+
+def run_fill_cycle_job(job):
+    # Fills the baseline, then fans the targets out as separate jobs sharing
+    # this job's batch so they spread across workers and retry on their own.
+    payload = job["payload"]
+    lab_id = payload["lab"]
+    baseline_url = payload["baseline_url"]
+    if payload.get("start_message"):
+        broadcast("fill_start", {"message": payload["start_message"]}, lab=lab_id)
+    # Filling the baseline records every value it enters in the fill plan,
+    # which then goes out with each target's job so they all get the same data.
+    fill_plan = FillPlan(payload["seed"], payload.get("entry_text"))
+    plan = None
+    if FILL_ENGINE == "http":
+        # The baseline is always filled in the browser; the state-changing
+        # requests it makes become the plan replayed against every target.
+        recorded = fill_one(
+            payload,
+            baseline_url,
+            "baseline",
+            capture_requests=True,
+            fill_plan=fill_plan,
+            batch=job["batch"],
+        )
+        plan = build_replay_plan(recorded, baseline_url)
+        if plan:
             broadcast(
                 "fill_log",
-                {"message": f"[baseline] fill completed for {baseline_url}"},
+                {"message": f"[baseline] learned {len(plan)} request(s) for HTTP replay."},
+                lab=lab_id,
             )
-        try:
-            if entry_text:
-                broadcast(
-                    "fill_log",
-                    {
-                        "message": (
-                            f"[{payload.get('target_name', 'target')}] "
-                            f"{payload['url']} entry: {entry_text}"
-                        )
-                    },
-                )
-            run_fill_session(
-                url=payload["url"],
-                mode=payload["mode"],
-                iterations=payload["iterations"],
-                min_wait=payload["min_wait"],
-                max_wait=payload["max_wait"],
-                headless=payload["headless"],
-                seed=payload["seed"],
-                entry_mode=payload["entry_mode"],
-                entry_text=entry_text,
-                log_cb=lambda message: broadcast(
-                    "fill_log", {"message": f"[target] {message}"}
+        else:
+            broadcast(
+                "fill_log",
+                {"message": "[baseline] nothing to replay over HTTP; using the browser."},
+                lab=lab_id,
+            )
+    else:
+        fill_one(payload, baseline_url, "baseline", fill_plan=fill_plan, batch=job["batch"])
+    targets = payload.get("targets")
+    if targets is None:
+        targets = list_students(lab_id)
+    spread_seconds = payload.get("spread_seconds") or 0
+    try:
+        enqueue_fill_targets(job, targets, plan, fill_plan, spread_seconds)
+    except sqlite3.Error as exc:
+        # The baseline already has this cycle's data; don't fill it again.
+        raise PermanentJobError(f"could not queue target fills: {exc}") from exc
+
+
+def enqueue_fill_targets(job, targets, plan, fill_plan, spread_seconds):
+    payload = job["payload"]
+    lab_id = payload["lab"]
+    now = time.time()
+    with write_db() as conn:
+        for target in targets:
+            url = target["url"]
+            name = target["name"]
+            if not is_valid_url(url):
+                queue_leaderboard_update(leaderboard_entry(lab_id, url, name, False))
+                broadcast("fill_log", {"message": f"[{name}] invalid URL; skipped."}, lab=lab_id)
+                continue
+            enqueue_job(
+                conn,
+                "fill_replay" if plan else "fill",
+                {
+                    **payload,
+                    "url": url,
+                    "target_name": name,
+                    "targets": None,
+                    "start_message": None,
+                    "replay": plan,
+                    "fill_plan": fill_plan.to_dict(),
+                },
+                now,
+                priority=job["priority"],
+                dedup_key=f"fill:{lab_id}:{url}",
+                batch=job["batch"],
+                max_attempts=JOB_MAX_ATTEMPTS,
+                delay=jittered(
+                    spread_offset((lab_id, url), spread_seconds), SCHEDULE_JITTER_RATIO
                 ),
             )
+
+
+def run_fill_job(job):
+    payload = job["payload"]
+    name = payload.get("target_name") or "target"
+    broadcast("fill_log", {"message": f"[{name}] filling {payload['url']}"}, lab=payload["lab"])
+    fill_one(payload, payload["url"], name, batch=job["batch"])
+    if payload.get("compare_after"):
+        try:
+            compare_and_queue(payload["lab"], payload["url"], name, payload["baseline_url"])
         except Exception as exc:
+            raise PermanentJobError(f"compare after fill failed: {exc}") from exc
+
+
+def run_fill_replay_job(job):
+    payload = job["payload"]
+    lab_id = payload["lab"]
+    url = payload["url"]
+    name = payload.get("target_name") or "target"
+    broadcast("fill_log", {"message": f"[{name}] replaying fill over HTTP to {url}"}, lab=lab_id)
+    trace = FillTrace()
+    try:
+        replay_plan(
+            payload["replay"],
+            url,
+            log_cb=lambda message: broadcast(
+                "fill_log",
+                {"message": f"[{name}] {message}"},
+                lab=lab_id,
+            ),
+            trace=trace,
+        )
+    except ReplayError as exc:
+        save_fill_trace(lab_id, job["batch"], url, name, "http", trace, str(exc))
+        if exc.sent:
+            # Part of the data already landed; a browser refill would
+            # duplicate it, so fail without a retry. The target's data did
+            # change, so refresh its status now rather than at its next check.
             broadcast(
                 "fill_error",
-                {"message": f"Auto-fill failed for target ({payload['url']}): {exc}"},
+                {"message": f"HTTP replay failed part-way for {name} ({url}): {exc}"},
+                lab=lab_id,
             )
-            return
-        target_label = payload.get("target_name") or "target"
+            try:
+                compare_and_queue(lab_id, url, name, payload["baseline_url"])
+            except Exception as compare_exc:
+                print(f"[jobs] compare after partial replay failed: {compare_exc}", flush=True)
+            raise PermanentJobError(
+                f"HTTP replay failed after {exc.sent} request(s): {exc}"
+            ) from exc
         broadcast(
             "fill_log",
-            {"message": f"[{target_label}] fill completed for {payload['url']}"},
+            {"message": f"[{name}] HTTP replay failed ({exc}); falling back to the browser."},
+            lab=lab_id,
         )
-        broadcast("fill_done", {"message": "Form filling complete."})
-    except Exception as exc:
-        broadcast("fill_error", {"message": f"Form filling failed: {exc}"})
+        submit_job(
+            "fill",
+            {**payload, "replay": None},
+            priority=job["priority"],
+            dedup_key=job["dedup_key"],
+            batch=job["batch"],
+        )
+        return
+    save_fill_trace(lab_id, job["batch"], url, name, "http", trace)
+    broadcast("fill_log", {"message": f"[{name}] fill completed for {url}"}, lab=lab_id)
+    if payload.get("compare_after"):
+        compare_and_queue(lab_id, url, name, payload["baseline_url"])
+
+
+def run_compare_job(job):
+    payload = job["payload"]
+    compare_and_queue(payload["lab"], payload["url"], payload["name"], payload["baseline_url"])
+
+
+FILL_JOB_KINDS = ("fill_cycle", "fill")
+JOB_HANDLERS = {
+    "fill_cycle": run_fill_cycle_job,
+    "fill": run_fill_job,
+    "fill_replay": run_fill_replay_job,
+    "compare": run_compare_job,
+}
+
+
+def run_job(job, worker_id):
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(JOB_VISIBILITY_SECONDS / 3):
+            try:
+                with write_db() as conn:
+                    extend_job(conn, job["id"], worker_id, time.time() + JOB_VISIBILITY_SECONDS)
+            except sqlite3.Error as exc:
+                print(f"[jobs] heartbeat for #{job['id']} failed: {exc}", flush=True)
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+    try:
+        JOB_HANDLERS[job["kind"]](job)
+    finally:
+        stop.set()
+
+
+def finish_job(job, worker_id, error=None, retry=True):
+    now = time.time()
+    with write_db() as conn:
+        if error is None:
+            outcome = "done" if complete_job(conn, job["id"], worker_id, now) else "lost"
+        else:
+            outcome = fail_job(
+                conn, job["id"], worker_id, error, now, JOB_RETRY_DELAY_SECONDS, retry=retry
+            ) or "lost"
+        # Checked in the same write transaction so exactly one worker sees
+        # the batch drain and announces it.
+        drained = job["batch"] is not None and not batch_pending(conn, job["batch"])
+        failed = batch_failed(conn, job["batch"]) if drained else 0
+    if error is not None:
+        print(
+            f"[jobs] {job['kind']} #{job['id']} attempt {job['attempts']}/"
+            f"{job['max_attempts']} failed ({outcome}): {error}",
+            flush=True,
+        )
+    elif outcome == "lost":
+        print(f"[jobs] {job['kind']} #{job['id']} finished after its claim expired", flush=True)
+    if drained:
+        # The cycle's compare results go out together as soon as it ends;
+        # otherwise they wait for the timed flush.
+        flush_leaderboard_updates()
+        payload = job["payload"]
+        if job["kind"] in FILL_JOB_KINDS + ("fill_replay",):
+            # Reporting only: a bad trace must not hold back fill_done.
+            try:
+                log_cycle_stats(payload.get("lab"), job["batch"])
+            except (sqlite3.Error, ValueError, KeyError, TypeError) as exc:
+                print(f"[fill] could not summarize cycle {job['batch']}: {exc}", flush=True)
+        if failed:
+            broadcast(
+                "fill_error",
+                {"message": f"Form filling finished with {failed} failed job(s)."},
+                lab=payload.get("lab"),
+            )
+        else:
+            broadcast(
+                "fill_done",
+                {"message": payload.get("done_message") or "Form filling complete."},
+                lab=payload.get("lab"),
+            )
+
+
+def log_cycle_stats(lab_id, batch):
+    with read_db() as conn:
+        traces = list_fill_traces(conn, lab_id, batch=batch, limit=10000)
+    if not traces:
+        return
+    stats = cycle_stats(traces)
+    phases = sorted(stats["phases"].items(), key=lambda item: -item[1]["total_ms"])
+    slowest = ", ".join(f"{name} {phase['total_ms'] / 1000:.1f}s" for name, phase in phases[:3])
+    print(
+        f"[fill] cycle {batch}: {stats['fills']} fill(s), {stats['errors']} error(s), "
+        f"wall {stats['wall_ms'] / 1000:.1f}s, p95 fill {stats['fill_ms']['p95_ms'] / 1000:.1f}s; "
+        f"top phases: {slowest}",
+        flush=True,
+    )
+
+
+def read_memory_stat(path, key):
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                name, _, value = line.partition(" ")
+                if name == key:
+                    return int(value)
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def read_memory_limit_mb(root="/sys/fs/cgroup"):
+    # cgroup v2, then v1: the container limit is what gets the worker killed,
+    # not the host's free memory. Usage counts page cache, so the inactive
+    # part of it, which the kernel reclaims before killing, is subtracted.
+    for limit_name, usage_name, stat_name, inactive_key in (
+        ("memory.max", "memory.current", "memory.stat", "inactive_file"),
+        (
+            "memory/memory.limit_in_bytes",
+            "memory/memory.usage_in_bytes",
+            "memory/memory.stat",
+            "total_inactive_file",
+        ),
+    ):
+        try:
+            with open(os.path.join(root, limit_name), "r", encoding="utf-8") as handle:
+                limit = handle.read().strip()
+            with open(os.path.join(root, usage_name), "r", encoding="utf-8") as handle:
+                usage = int(handle.read().strip())
+        except (OSError, ValueError):
+            continue
+        if limit.isdigit() and int(limit) < 2**60:
+            inactive = read_memory_stat(os.path.join(root, stat_name), inactive_key)
+            usage = max(0, usage - inactive)
+            return (int(limit) - usage) // (1024 * 1024)
+    return None
+
+
+def available_memory_mb():
+    available = []
+    try:
+        with open("/proc/meminfo", "r", encoding="utf-8") as handle:
+            for line in handle:
+                if line.startswith("MemAvailable:"):
+                    available.append(int(line.split()[1]) // 1024)
+                    break
+    except (OSError, ValueError):
+        pass
+    container = read_memory_limit_mb()
+    if container is not None:
+        available.append(container)
+    return min(available) if available else None
+
+
+def low_memory_reason(starting=0):
+    # Fills claimed in the last FILL_STARTUP_SECONDS may not have started
+    # their browser yet, so free memory must cover them as well as a new one.
+    free_mb = available_memory_mb()
+    needed_mb = FILL_BROWSER_MEMORY_MB * (1 + starting)
+    if free_mb is not None and free_mb < needed_mb:
+        return (
+            f"{free_mb} MB free, {needed_mb} MB needed "
+            f"({FILL_BROWSER_MEMORY_MB} MB per browser, {starting} starting)"
+        )
+    return None
+
+
+def work_jobs(worker_id, parent_pid=None):
+    last_memory_hold = None
+    while True:
+        if parent_pid is not None and os.getppid() != parent_pid:
+            return
+        memory_hold = last_memory_hold
+        try:
+            now = time.time()
+            with write_db() as conn:
+                # Fills open a browser each; past the concurrency or memory
+                # cap this worker keeps serving compares and leaves fills
+                # queued for later. Both are checked under the claim's write
+                # lock so two workers cannot pass them at the same time. A
+                # fill on this worker's idle pooled browser adds nothing to
+                # memory usage, which already counts that browser.
+                warm = warm_driver_available()
+                memory_hold = None if warm else low_memory_reason(
+                    starting_count(conn, FILL_JOB_KINDS, now, FILL_STARTUP_SECONDS)
+                )
+                hold_fills = (
+                    memory_hold is not None
+                    or running_count(conn, FILL_JOB_KINDS, now) >= FILL_CONCURRENCY
+                )
+                job = claim_job(
+                    conn,
+                    worker_id,
+                    now,
+                    JOB_VISIBILITY_SECONDS,
+                    exclude_kinds=FILL_JOB_KINDS if hold_fills else (),
+                    launching=not warm,
+                )
+        except sqlite3.Error as exc:
+            print(f"[jobs] claim failed: {exc}", flush=True)
+            job = None
+        if memory_hold != last_memory_hold:
+            if memory_hold:
+                print(f"[jobs] {worker_id} holding fills: {memory_hold}", flush=True)
+            else:
+                print(f"[jobs] {worker_id} resuming fills", flush=True)
+            last_memory_hold = memory_hold
+        if job is None:
+            time.sleep(JOB_POLL_SECONDS)
+            continue
+        try:
+            run_job(job, worker_id)
+        except PermanentJobError as exc:
+            finish_job(job, worker_id, error=str(exc), retry=False)
+        except Exception as exc:
+            finish_job(job, worker_id, error=str(exc) or exc.__class__.__name__)
+        except BaseException:
+            with write_db() as conn:
+                release_job(conn, job["id"], worker_id)
+            raise
+        else:
+            finish_job(job, worker_id)
+
+
+def stop_driver_pool(pool):
+    pool.shutdown()
+    print(f"[drivers] pool stopped: {pool.stats()}", flush=True)
+
+
+def start_driver_pool():
+    if DRIVER_POOL_SIZE <= 0:
+        return
+    # A job worker runs one job at a time, so a second browser would only sit
+    # idle. None is started up front: the first fill launches the browser
+    # and later fills on this worker reuse it, so a worker that never fills
+    # (automation off) never starts Chrome.
+    pool = configure_driver_pool(min(DRIVER_POOL_SIZE, 1), DRIVER_MAX_USES)
+    atexit.register(stop_driver_pool, pool)
+
+
+def run_job_worker(index, parent_pid):
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    load_settings_cache()
+    if EVENT_RELAY:
+        start_event_relay()
+    start_driver_pool()
+    start_job_result_flush()
+    try:
+        work_jobs(f"{INSTANCE_ID}-w{index}", parent_pid)
     finally:
-        with active_fill_lock:
-            fill_active = False
+        flush_leaderboard_updates()
+        flush_relay_events()
+
+
+def stop_job_workers(workers):
+    for worker in workers:
+        worker.terminate()
+    for worker in workers:
+        worker.join(timeout=10)
+
+
+def start_job_workers():
+    if JOB_WORKERS <= 0:
+        start_driver_pool()
+        start_job_result_flush()
+        threading.Thread(target=work_jobs, args=(f"{INSTANCE_ID}-w0",), daemon=True).start()
+        return
+    # Separate processes rather than threads: each worker drives its own
+    # browsers, and one that crashes or leaks can't take the others with it.
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(
+            target=run_job_worker,
+            args=(index, os.getpid()),
+            name=f"verifier-jobs-{index}",
+        )
+        for index in range(JOB_WORKERS)
+    ]
+    for worker in workers:
+        worker.start()
+    atexit.register(stop_job_workers, workers)
+
+
+def prune_finished_jobs():
+    global last_job_prune_at
+    now = time.time()
+    if now - last_job_prune_at < 3600:
+        return
+    last_job_prune_at = now
+    with write_db() as conn:
+        pruned = prune_jobs(conn, now - JOB_RETENTION_HOURS * 3600)
+        pruned_traces = prune_fill_traces(conn, now - FILL_TRACE_RETENTION_HOURS * 3600)
+    if pruned:
+        print(f"[jobs] pruned {pruned} finished job(s)", flush=True)
+    if pruned_traces:
+        print(f"[fill] pruned {pruned_traces} fill trace(s)", flush=True)
+
+
+@app.get("/api/jobs")
+def jobs():
+    with read_db() as conn:
+        counts = queue_counts(conn)
+    return jsonify({"workers": JOB_WORKERS, "jobs": counts})
+
+
+@app.get("/api/fill-traces")
+def get_fill_traces():
+    # ?batch= returns one cycle's traces with its aggregates, ?url= one
+    # target's recent traces; otherwise the latest cycles' aggregates.
+    lab_id = (request.args.get("lab") or DEFAULT_LAB_ID).strip().lower()
+    if not get_lab(lab_id):
+        return jsonify({"error": "Unknown lab."}), 400
+    batch = (request.args.get("batch") or "").strip()
+    target_url = (request.args.get("url") or "").strip()
+    try:
+        limit = max(1, min(500, int(request.args.get("limit") or 50)))
+    except ValueError:
+        return jsonify({"error": "limit must be a number."}), 400
+    with read_db() as conn:
+        if batch:
+            traces = list_fill_traces(conn, lab_id, batch=batch, limit=10000)
+            return jsonify(
+                {"lab": lab_id, "batch": batch, "stats": cycle_stats(traces), "traces": traces}
+            )
+        if target_url:
+            traces = list_fill_traces(conn, lab_id, target_url=target_url, limit=limit)
+            return jsonify({"lab": lab_id, "url": target_url, "traces": traces})
+        cycles = []
+        for cycle in recent_cycles(conn, lab_id, limit=min(limit, 20)):
+            traces = list_fill_traces(conn, lab_id, batch=cycle, limit=10000)
+            cycles.append({"batch": cycle, **cycle_stats(traces)})
+    return jsonify({"lab": lab_id, "cycles": cycles})
 
 
 @app.get("/api/leaderboard")
@@ -3077,176 +3975,373 @@ def get_leaderboard():
     lab = get_lab(lab_id)
     if not lab:
         return jsonify({"error": "Unknown lab."}), 400
-    return jsonify({"leaderboard": list_leaderboard(lab_id)})
+    return cached_json_response(
+        "leaderboard", lab_id, lambda: {"leaderboard": list_leaderboard(lab_id)}
+    )
+
+
+@app.get("/api/history")
+def get_history():
+    lab_id = (request.args.get("lab") or DEFAULT_LAB_ID).strip().lower()
+    target_url = (request.args.get("url") or "").strip()
+    if not get_lab(lab_id):
+        return jsonify({"error": "Unknown lab."}), 400
+    if not target_url:
+        return jsonify({"error": "App URL is required."}), 400
+    now = int(time.time())
+    try:
+        since = int(request.args.get("since") or now - 86400)
+        until = int(request.args.get("until") or now + 1)
+    except ValueError:
+        return jsonify({"error": "since/until must be unix timestamps."}), 400
+    history = get_compare_history(lab_id, target_url, since, until)
+    return jsonify({"lab": lab_id, "url": target_url, "since": since, "until": until, **history})
+
 
-def compare_and_update(lab_id, target_url, name, baseline_url):
+def compare_and_queue(lab_id, target_url, name, baseline_url):
     endpoints = parse_endpoints(os.environ.get("COMPARE_ENDPOINTS"))
-    ok, _results = compare_endpoints(baseline_url, target_url, endpoints)
-    update_leaderboard(lab_id, target_url, name, ok)
+    started_at = time.time()
+    ok, results = compare_endpoints(baseline_url, target_url, endpoints)
+    elapsed_ms = int((time.time() - started_at) * 1000)
+    queue_leaderboard_update(
+        leaderboard_entry(
+            lab_id, target_url, name, ok, results=results, elapsed_ms=elapsed_ms
+        )
+    )
     return ok
 
 
 def run_fill_loop():
-    global fill_active, next_auto_fill_at, next_auto_fill_entry_text, next_auto_fill_seed
-    global last_auto_fill_wait_seconds
+    cycle_batch = None
     while True:
-        if not automation_enabled:
-            next_auto_fill_at = None
-            next_auto_fill_entry_text = None
-            next_auto_fill_seed = None
+        wait_for_lease("fill_loop")
+        if not get_setting("automation_enabled", False):
+            clear_next_auto_fill()
             broadcast_fill_meta()
-            time.sleep(random.randint(AUTO_INTERVAL_MIN_SECONDS, AUTO_INTERVAL_MAX_SECONDS))
+            time.sleep(random_auto_interval())
             continue
         baseline_url = os.environ.get(
             "BASELINE_URL", get_setting("baseline_url", DEFAULT_BASELINE_URL)
         )
         if not is_valid_url(baseline_url):
-            wait_seconds = random.randint(AUTO_INTERVAL_MIN_SECONDS, AUTO_INTERVAL_MAX_SECONDS)
-            last_auto_fill_wait_seconds = wait_seconds
-            next_auto_fill_at = time.time() + wait_seconds
-            next_auto_fill_seed = int(next_auto_fill_at)
-            next_auto_fill_entry_text = generate_entry_text("local", seed=next_auto_fill_seed)
-            broadcast_fill_meta()
+            wait_seconds = random_auto_interval()
+            schedule_next_auto_fill(wait_seconds)
             time.sleep(wait_seconds)
             continue
 
-        with active_fill_lock:
-            if fill_active:
-                wait_seconds = random.randint(AUTO_INTERVAL_MIN_SECONDS, AUTO_INTERVAL_MAX_SECONDS)
-                last_auto_fill_wait_seconds = wait_seconds
-                next_auto_fill_at = time.time() + wait_seconds
-                next_auto_fill_seed = int(next_auto_fill_at)
-                next_auto_fill_entry_text = generate_entry_text("local", seed=next_auto_fill_seed)
-                broadcast_fill_meta()
+        if cycle_batch is not None:
+            with read_db() as conn:
+                still_running = batch_pending(conn, cycle_batch)
+            if still_running:
+                wait_seconds = random_auto_interval()
+                schedule_next_auto_fill(wait_seconds)
                 time.sleep(wait_seconds)
                 continue
-            fill_active = True
 
         try:
-            broadcast("fill_start", {"message": "Auto-fill: baseline + student apps."})
-            if next_auto_fill_entry_text is not None and next_auto_fill_seed is not None:
-                shared_seed = next_auto_fill_seed
-                entry_text = next_auto_fill_entry_text
-            else:
+            shared_seed = get_setting("next_auto_fill_seed")
+            entry_text = get_setting("next_auto_fill_entry_text")
+            if entry_text is None or shared_seed is None:
                 shared_seed = int(time.time())
                 entry_text = generate_entry_text("local", seed=shared_seed)
-            next_auto_fill_at = None
-            next_auto_fill_entry_text = None
-            next_auto_fill_seed = None
+            clear_next_auto_fill()
             broadcast_fill_meta()
-            if entry_text:
-                broadcast("fill_log", {"message": f"[baseline] entry: {entry_text}"})
-            try:
-                run_fill_session(
-                    url=baseline_url,
-                    mode=FILL_MODE,
-                    iterations=FILL_ITERATIONS,
-                    min_wait=1,
-                    max_wait=2,
-                    headless=True,
-                    seed=shared_seed,
-                    entry_mode="local",
-                    entry_text=entry_text,
-                    log_cb=lambda message: broadcast(
-                        "fill_log", {"message": f"[baseline] {message}"}
-                    ),
-                )
-            except Exception as exc:
-                broadcast(
-                    "fill_error",
-                    {"message": f"Auto-fill failed for baseline ({baseline_url}): {exc}"},
-                )
-                continue
-
-            students = list_students(AUTOMATION_LAB_ID)
-
-            for student in students:
-                url = student["url"]
-                name = student["name"]
-                if not is_valid_url(url):
-                    update_leaderboard(AUTOMATION_LAB_ID, url, name, False)
-                    broadcast("fill_log", {"message": f"[{name}] invalid URL; skipped."})
-                    continue
-                broadcast("fill_log", {"message": f"[{name}] filling {url}"})
-                try:
-                    if entry_text:
-                        broadcast(
-                            "fill_log",
-                            {"message": f"[{name}] entry: {entry_text}"},
-                        )
-                    run_fill_session(
-                        url=url,
-                        mode=FILL_MODE,
-                        iterations=FILL_ITERATIONS,
-                        min_wait=1,
-                        max_wait=2,
-                        headless=True,
-                        seed=shared_seed,
-                        entry_mode="local",
-                        entry_text=entry_text,
-                        log_cb=lambda message: broadcast(
-                            "fill_log", {"message": f"[{name}] {message}"}
-                        ),
-                    )
-                except Exception as exc:
-                    broadcast(
-                        "fill_error",
-                        {"message": f"Auto-fill failed for {name} ({url}): {exc}"},
-                    )
-                    continue
-                broadcast(
-                    "fill_log",
-                    {"message": f"[{name}] fill completed for {url}"},
-                )
-                compare_and_update(AUTOMATION_LAB_ID, url, name, baseline_url)
-            broadcast("fill_done", {"message": "Auto-fill cycle complete."})
+            cycle_batch = f"auto-{uuid.uuid4().hex[:12]}"
+            submit_job(
+                "fill_cycle",
+                {
+                    "lab": AUTOMATION_LAB_ID,
+                    "baseline_url": baseline_url,
+                    "seed": shared_seed,
+                    "entry_text": entry_text,
+                    "compare_after": True,
+                    "spread_seconds": FILL_SPREAD_SECONDS,
+                    "start_message": "Auto-fill: baseline + student apps.",
+                    "done_message": "Auto-fill cycle complete.",
+                },
+                priority=PRIORITY_PERIODIC,
+                dedup_key=f"fill_cycle:{AUTOMATION_LAB_ID}",
+                batch=cycle_batch,
+            )
         except Exception as exc:
-            broadcast("fill_error", {"message": f"Auto-fill failed: {exc}"})
-        finally:
-            with active_fill_lock:
-                fill_active = False
-        wait_seconds = random.randint(AUTO_INTERVAL_MIN_SECONDS, AUTO_INTERVAL_MAX_SECONDS)
-        last_auto_fill_wait_seconds = wait_seconds
-        next_auto_fill_at = time.time() + wait_seconds
-        next_auto_fill_seed = int(next_auto_fill_at)
-        next_auto_fill_entry_text = generate_entry_text("local", seed=next_auto_fill_seed)
-        broadcast_fill_meta()
+            broadcast("fill_error", {"message": f"Auto-fill failed: {exc}"}, lab=AUTOMATION_LAB_ID)
+        wait_seconds = random_auto_interval()
+        schedule_next_auto_fill(wait_seconds)
         time.sleep(wait_seconds)
 
 
 def run_compare_loop():
+    schedule = CompareSchedule(
+        COMPARE_MIN_INTERVAL_SECONDS, COMPARE_MAX_INTERVAL_SECONDS, SCHEDULE_JITTER_RATIO
+    )
+    last_baseline_url = None
+    next_refresh_at = 0
     while True:
+        wait_for_lease("compare_loop")
         baseline_url = os.environ.get(
             "BASELINE_URL", get_setting("baseline_url", DEFAULT_BASELINE_URL)
         )
         if not is_valid_url(baseline_url):
-            time.sleep(COMPARE_INTERVAL_SECONDS)
+            time.sleep(COMPARE_MIN_INTERVAL_SECONDS)
             continue
-        students = list_students(COMPARE_LAB_ID)
-        if students:
-            broadcast(
-                "fill_log",
-                {"message": "Periodic check: validating submitted apps."},
+        now = time.time()
+        if now >= next_refresh_at:
+            students = list_students(COMPARE_LAB_ID)
+            added = schedule.sync_targets(
+                {(COMPARE_LAB_ID, student["url"]): student["name"] for student in students},
+                now,
             )
-        for student in students:
-            url = student["url"]
-            name = student["name"]
-            if not is_valid_url(url):
-                update_leaderboard(COMPARE_LAB_ID, url, name, False)
-                broadcast("fill_log", {"message": f"[{name}] invalid URL; skipped."})
+            if added:
+                broadcast(
+                    "fill_log",
+                    {"message": f"Periodic check: tracking {len(added)} new app(s)."},
+                    lab=COMPARE_LAB_ID,
+                )
+            next_refresh_at = now + COMPARE_MIN_INTERVAL_SECONDS
+        if baseline_url != last_baseline_url:
+            if last_baseline_url is not None:
+                schedule.reset(now)
+            last_baseline_url = baseline_url
+
+        # Results land in the leaderboard whenever a compare finishes, whether
+        # this loop queued it or a submission did; each new one sets the
+        # target's next interval from its fresh status.
+        with read_db() as conn:
+            rows = conn.execute(
+                "SELECT url, sync, last_checked FROM leaderboard WHERE lab = ?",
+                (COMPARE_LAB_ID,),
+            ).fetchall()
+        for row in rows:
+            schedule.record_result(
+                (COMPARE_LAB_ID, row["url"]),
+                None if row["sync"] is None else bool(row["sync"]),
+                row["last_checked"],
+                now,
+            )
+
+        due = schedule.pop_due(now)
+        if due:
+            with write_db() as conn:
+                for key in due:
+                    lab_id, url = key
+                    name = schedule.targets[key]["name"]
+                    if not is_valid_url(url):
+                        queue_leaderboard_update(leaderboard_entry(lab_id, url, name, False))
+                        broadcast(
+                            "fill_log",
+                            {"message": f"[{name}] invalid URL; skipped."},
+                            lab=lab_id,
+                        )
+                        # Nothing will change until the URL is resubmitted.
+                        schedule.observe(key, True, now)
+                        continue
+                    schedule.defer(key, now)
+                    enqueue_job(
+                        conn,
+                        "compare",
+                        {
+                            "lab": lab_id,
+                            "url": url,
+                            "name": name,
+                            "baseline_url": baseline_url,
+                        },
+                        now,
+                        priority=PRIORITY_PERIODIC,
+                        dedup_key=f"compare:{lab_id}:{url}",
+                        max_attempts=1,
+                    )
+            flush_leaderboard_updates()
+        compact_compare_history()
+        prune_finished_jobs()
+
+        wake_at = min(next_refresh_at, time.time() + COMPARE_RESULT_POLL_SECONDS)
+        next_due = schedule.next_due()
+        if next_due is not None:
+            wake_at = min(wake_at, next_due)
+        time.sleep(max(1, wake_at - time.time()))
+
+
+def acquire_lease(name):
+    now = time.time()
+    with write_db() as conn:
+        row = conn.execute(
+            """
+            INSERT INTO scheduler_leases (name, owner, acquired_at, renewed_at, expires_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET
+                owner=excluded.owner,
+                acquired_at=CASE
+                    WHEN scheduler_leases.owner = excluded.owner
+                    THEN scheduler_leases.acquired_at
+                    ELSE excluded.acquired_at
+                END,
+                renewed_at=excluded.renewed_at,
+                expires_at=excluded.expires_at
+            WHERE scheduler_leases.owner = excluded.owner
+                OR scheduler_leases.expires_at < excluded.renewed_at
+            RETURNING acquired_at
+            """,
+            (name, INSTANCE_ID, now, now, now + SCHEDULER_LEASE_SECONDS),
+        ).fetchone()
+    return row is not None, now
+
+
+def release_leases():
+    with held_leases_lock:
+        names = list(held_leases)
+        held_leases.clear()
+    if not names:
+        return
+    placeholders = ",".join("?" for _ in names)
+    with write_db() as conn:
+        conn.execute(
+            f"DELETE FROM scheduler_leases WHERE owner = ? AND name IN ({placeholders})",
+            (INSTANCE_ID, *names),
+        )
+
+
+def holds_lease(name):
+    with held_leases_lock:
+        return held_leases.get(name, 0) > time.time()
+
+
+def wait_for_lease(name):
+    while not holds_lease(name):
+        time.sleep(SCHEDULER_LEASE_SECONDS / 3)
+
+
+def run_lease_keeper(names):
+    while True:
+        for name in names:
+            try:
+                acquired, renewed_at = acquire_lease(name)
+            except sqlite3.Error as exc:
+                print(f"[lease] {name}: renew failed: {exc}", flush=True)
                 continue
-            compare_and_update(COMPARE_LAB_ID, url, name, baseline_url)
-        time.sleep(COMPARE_INTERVAL_SECONDS)
+            with held_leases_lock:
+                was_held = held_leases.get(name, 0) > time.time()
+                if acquired:
+                    # Give up locally a beat before the lease really expires so
+                    # a stalled renewal can't overlap with the next leader.
+                    held_leases[name] = renewed_at + SCHEDULER_LEASE_SECONDS * 0.8
+                else:
+                    held_leases.pop(name, None)
+            if acquired and not was_held:
+                print(f"[lease] {INSTANCE_ID} now leads {name}", flush=True)
+            elif was_held and not acquired:
+                print(f"[lease] {INSTANCE_ID} lost {name}", flush=True)
+        time.sleep(SCHEDULER_LEASE_SECONDS / 3)
+
+
+@app.get("/api/schedulers")
+def schedulers():
+    with read_db() as conn:
+        rows = conn.execute(
+            """
+            SELECT name, owner, acquired_at, renewed_at, expires_at
+            FROM scheduler_leases
+            ORDER BY name ASC
+            """
+        ).fetchall()
+    now = time.time()
+    return jsonify(
+        {
+            "instance": INSTANCE_ID,
+            "leases": [dict(row, active=row["expires_at"] > now) for row in rows],
+        }
+    )
 
 
-if __name__ == "__main__":
-    port = int(os.environ.get("PORT", "8000"))
-    init_db()
+def start_background_loops():
+    names = ["fill_loop", "compare_loop"]
+    if LOAD_TEST_ENABLED:
+        names.append("load_loop")
+    lease_thread = threading.Thread(target=run_lease_keeper, args=(names,), daemon=True)
+    lease_thread.start()
+    atexit.register(release_leases)
     thread = threading.Thread(target=run_fill_loop, daemon=True)
     thread.start()
     compare_thread = threading.Thread(target=run_compare_loop, daemon=True)
     compare_thread.start()
+    if LEADERBOARD_FLUSH_MS > 0:
+        flush_thread = threading.Thread(target=run_leaderboard_flush_loop, daemon=True)
+        flush_thread.start()
     if LOAD_TEST_ENABLED:
         load_thread = threading.Thread(target=run_load_loop, daemon=True)
         load_thread.start()
-    app.run(host="0.0.0.0", port=port, debug=False)
+
+
+def run_scheduler_process():
+    # terminate() sends SIGTERM; exit through atexit so leases are released,
+    # job workers are stopped and another replica can take over without
+    # waiting for expiry.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    load_settings_cache()
+    if EVENT_RELAY:
+        start_event_relay()
+    start_job_workers()
+    start_background_loops()
+    while True:
+        time.sleep(3600)
+
+
+def use_event_relay():
+    global EVENT_RELAY, SETTINGS_REVALIDATE_SECONDS
+    # Child processes (spawned scheduler/job workers, forked web workers) read
+    # these at import/fork time: every broadcast goes through the SQLite relay,
+    # and settings written by one process are picked up by the others.
+    EVENT_RELAY = True
+    os.environ["EVENT_RELAY"] = "true"
+    os.environ.setdefault("SETTINGS_REVALIDATE_SECONDS", "1")
+    SETTINGS_REVALIDATE_SECONDS = float(os.environ["SETTINGS_REVALIDATE_SECONDS"])
+
+
+def serve_production(port):
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print("SERVE_MODE=production requires gunicorn (pip install gunicorn).", flush=True)
+        raise SystemExit(2)
+
+    use_event_relay()
+
+    scheduler = multiprocessing.get_context("spawn").Process(
+        target=run_scheduler_process, name="verifier-schedulers"
+    )
+    scheduler.start()
+
+    class VerifierServer(BaseApplication):
+        def load_config(self):
+            options = {
+                "bind": f"0.0.0.0:{port}",
+                "workers": WEB_WORKERS,
+                "worker_class": "gthread",
+                "threads": WEB_THREADS,
+                "worker_connections": WEB_MAX_CONNECTIONS,
+                "keepalive": WEB_KEEPALIVE_SECONDS,
+                "timeout": WEB_TIMEOUT_SECONDS,
+                "backlog": WEB_BACKLOG,
+                "post_worker_init": lambda worker: start_event_relay(reader=True),
+                "on_exit": lambda server: scheduler.terminate(),
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    VerifierServer().run()
+
+
+if __name__ == "__main__":
+    port = int(os.environ.get("PORT", "8000"))
+    init_db()
+    if SERVE_MODE == "production":
+        serve_production(port)
+    else:
+        if JOB_WORKERS > 0:
+            use_event_relay()
+            start_event_relay(reader=True)
+        start_job_workers()
+        start_background_loops()
+        app.run(host="0.0.0.0", port=port, debug=False)
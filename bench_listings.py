@@ -0,0 +1,87 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+LISTING_INDEXES = [
+    "idx_leaderboard_lab_checked",
+    "idx_leaderboard_checked",
+    "idx_students_lab_added",
+    "idx_students_added",
+]
+
+
+def seed(app, rows, labs):
+    leaderboard = []
+    students = []
+    for index in range(rows):
+        lab = f"bench-lab-{index % labs}"
+        url = f"http://team{index}.example/"
+        checked = None if index % 7 == 0 else 1_700_000_000 + index
+        leaderboard.append((lab, url, f"Team {index}", checked, index % 2))
+        students.append((lab, url, f"Team {index}", 1_700_000_000 + index))
+    with app.write_db() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO leaderboard (lab, url, name, last_checked, sync) "
+            "VALUES (?, ?, ?, ?, ?)",
+            leaderboard,
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO students (lab, url, name, added_at) VALUES (?, ?, ?, ?)",
+            students,
+        )
+        conn.execute("ANALYZE")
+
+
+def time_listing(call, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def run_listings(app, runs):
+    return {
+        "leaderboard (one lab)": time_listing(lambda: app.list_leaderboard("bench-lab-3"), runs),
+        "leaderboard (all labs)": time_listing(lambda: app.list_leaderboard(None), runs),
+        "students (one lab)": time_listing(lambda: app.list_students("bench-lab-3"), runs),
+        "students (all labs)": time_listing(lambda: app.list_students(None), runs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the leaderboard/student listing queries with and without "
+        "the migration 006 indexes on a scratch database."
+    )
+    parser.add_argument("--rows", type=int, default=12000)
+    parser.add_argument("--labs", type=int, default=40)
+    parser.add_argument("--runs", type=int, default=25)
+    args = parser.parse_args()
+
+    # app.py reads DB_PATH at import time.
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="bench-listings-"), "app.db")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app
+
+    app.init_db()
+    seed(app, args.rows, args.labs)
+    indexed = run_listings(app, args.runs)
+    with app.write_db() as conn:
+        for name in LISTING_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+    unindexed = run_listings(app, args.runs)
+
+    print(f"{args.rows} rows per table across {args.labs} labs, median of {args.runs} runs")
+    print(f"{'query':<24} {'no index':>10} {'indexed':>10}")
+    for label, indexed_ms in indexed.items():
+        print(f"{label:<24} {unindexed[label]:>8.2f}ms {indexed_ms:>8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import json
+
+
+STATUS_CODES = {"match": 0, "mismatch": 1, "error": 2}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+HOUR_SECONDS = 3600
+
+endpoint_paths = {}
+
+
+def overall_status(sync_status, results):
+    if any(item.get("status") == "error" for item in results or []):
+        return STATUS_CODES["error"]
+    return STATUS_CODES["match"] if sync_status is True else STATUS_CODES["mismatch"]
+
+
+def resolve_endpoint_ids(conn, paths):
+    # Runs inside the caller's write transaction, so ids are not cached here:
+    # a rollback would otherwise leave the cache pointing at unused ids.
+    conn.executemany(
+        "INSERT OR IGNORE INTO compare_history_endpoints (path) VALUES (?)",
+        [(path,) for path in paths],
+    )
+    placeholders = ",".join("?" for _ in paths)
+    rows = conn.execute(
+        f"SELECT id, path FROM compare_history_endpoints WHERE path IN ({placeholders})",
+        paths,
+    ).fetchall()
+    return {row["path"]: row["id"] for row in rows}
+
+
+def encode_results(results, ids):
+    # One [endpoint_id, status, missing, extra, ms] tuple per endpoint keeps a
+    # history row to a few dozen bytes instead of the full compare payload.
+    packed = []
+    for item in results:
+        packed.append(
+            [
+                ids[item["endpoint"]],
+                STATUS_CODES.get(item.get("status"), STATUS_CODES["error"]),
+                item.get("missing_count", 0),
+                item.get("extra_count", 0),
+                item.get("elapsed_ms", 0),
+            ]
+        )
+    return json.dumps(packed, separators=(",", ":"))
+
+
+def decode_results(conn, raw_value):
+    packed = json.loads(raw_value or "[]")
+    unknown = [item[0] for item in packed if item[0] not in endpoint_paths]
+    if unknown:
+        placeholders = ",".join("?" for _ in unknown)
+        rows = conn.execute(
+            f"SELECT id, path FROM compare_history_endpoints WHERE id IN ({placeholders})",
+            unknown,
+        ).fetchall()
+        for row in rows:
+            endpoint_paths[row["id"]] = row["path"]
+    return [
+        {
+            "endpoint": endpoint_paths.get(endpoint_id, str(endpoint_id)),
+            "status": STATUS_NAMES.get(status, "error"),
+            "missing_count": missing,
+            "extra_count": extra,
+            "elapsed_ms": elapsed_ms,
+        }
+        for endpoint_id, status, missing, extra, elapsed_ms in packed
+    ]
+
+
+def record_history(conn, entries):
+    entries = [entry for entry in entries if entry.get("results") is not None]
+    if not entries:
+        return
+    paths = sorted({item["endpoint"] for entry in entries for item in entry["results"]})
+    ids = resolve_endpoint_ids(conn, paths) if paths else {}
+    # Append-only: a second check of a target within the same second gets
+    # the next seq instead of replacing the first.
+    conn.executemany(
+        """
+        INSERT INTO compare_history
+            (lab, url, checked_at, seq, status, elapsed_ms, endpoints)
+        VALUES (
+            ?1, ?2, ?3,
+            (
+                SELECT COUNT(*) FROM compare_history
+                WHERE lab = ?1 AND url = ?2 AND checked_at = ?3
+            ),
+            ?4, ?5, ?6
+        )
+        """,
+        [
+            (
+                entry["lab"],
+                entry["url"],
+                entry["checked_at"],
+                overall_status(entry["sync"], entry["results"]),
+                entry.get("elapsed_ms") or 0,
+                encode_results(entry["results"], ids),
+            )
+            for entry in entries
+        ],
+    )
+
+
+def compact_history(conn, now, raw_retention_seconds, hourly_retention_seconds):
+    raw_cutoff = (int(now - raw_retention_seconds) // HOUR_SECONDS) * HOUR_SECONDS
+    conn.execute(
+        """
+        INSERT INTO compare_history_hourly
+            (lab, url, hour, checks, matches, errors, total_ms, max_ms)
+        SELECT
+            lab,
+            url,
+            (checked_at / 3600) * 3600 AS bucket,
+            COUNT(*),
+            SUM(status = 0),
+            SUM(status = 2),
+            SUM(elapsed_ms),
+            MAX(elapsed_ms)
+        FROM compare_history
+        WHERE checked_at < ?
+        GROUP BY lab, url, bucket
+        ON CONFLICT(lab, url, hour) DO UPDATE SET
+            checks = checks + excluded.checks,
+            matches = matches + excluded.matches,
+            errors = errors + excluded.errors,
+            total_ms = total_ms + excluded.total_ms,
+            max_ms = MAX(max_ms, excluded.max_ms)
+        """,
+        (raw_cutoff,),
+    )
+    downsampled = conn.execute(
+        "DELETE FROM compare_history WHERE checked_at < ?",
+        (raw_cutoff,),
+    ).rowcount
+    expired = conn.execute(
+        "DELETE FROM compare_history_hourly WHERE hour < ?",
+        (int(now - hourly_retention_seconds),),
+    ).rowcount
+    return downsampled, expired
+
+
+def sync_spans(points):
+    spans = []
+    for point in points:
+        if spans and spans[-1]["status"] == point["status"]:
+            spans[-1]["end"] = point["checked_at"]
+            spans[-1]["checks"] += 1
+            continue
+        if spans:
+            spans[-1]["end"] = point["checked_at"]
+        spans.append(
+            {
+                "status": point["status"],
+                "start": point["checked_at"],
+                "end": point["checked_at"],
+                "checks": 1,
+            }
+        )
+    return spans
+
+
+def target_timeline(conn, lab_id, target_url, since, until):
+    raw_rows = conn.execute(
+        """
+        SELECT checked_at, status, elapsed_ms, endpoints
+        FROM compare_history
+        WHERE lab = ? AND url = ? AND checked_at >= ? AND checked_at < ?
+        ORDER BY checked_at ASC, seq ASC
+        """,
+        (lab_id, target_url, since, until),
+    ).fetchall()
+    hourly_rows = conn.execute(
+        """
+        SELECT hour, checks, matches, errors, total_ms, max_ms
+        FROM compare_history_hourly
+        WHERE lab = ? AND url = ? AND hour >= ? AND hour < ?
+        ORDER BY hour ASC
+        """,
+        (lab_id, target_url, (since // HOUR_SECONDS) * HOUR_SECONDS, until),
+    ).fetchall()
+    points = [
+        {
+            "checked_at": row["checked_at"],
+            "status": STATUS_NAMES.get(row["status"], "error"),
+            "elapsed_ms": row["elapsed_ms"],
+            "endpoints": decode_results(conn, row["endpoints"]),
+        }
+        for row in raw_rows
+    ]
+    hourly = [
+        {
+            "hour": row["hour"],
+            "checks": row["checks"],
+            "matches": row["matches"],
+            "errors": row["errors"],
+            "avg_ms": int(row["total_ms"] / row["checks"]) if row["checks"] else 0,
+            "max_ms": row["max_ms"],
+        }
+        for row in hourly_rows
+    ]
+    return {"points": points, "hourly": hourly, "spans": sync_spans(points)}
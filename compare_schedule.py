@@ -0,0 +1,113 @@
+import heapq
+import random
+import zlib
+
+
+def spread_offset(key, window):
+    # Stable across processes and restarts (unlike hash()), so a target keeps
+    # its slot in the interval when leadership moves to another replica.
+    digest = zlib.crc32("|".join(str(part) for part in key).encode("utf-8"))
+    return window * digest / 2**32
+
+
+def jittered(seconds, ratio):
+    if ratio <= 0:
+        return seconds
+    return max(0, seconds * (1 + random.uniform(-ratio, ratio)))
+
+
+class CompareSchedule:
+    # Min-heap of (due_at, key) with lazy deletion: rescheduling or dropping a
+    # target leaves its old heap entry behind, and pop_due() skips entries
+    # whose due time no longer matches the target's current one.
+    def __init__(self, min_interval, max_interval, jitter_ratio=0):
+        self.min_interval = max(1, min_interval)
+        self.max_interval = max(self.min_interval, max_interval)
+        self.jitter_ratio = jitter_ratio
+        self.heap = []
+        self.targets = {}
+
+    def _push(self, key, due_at):
+        self.targets[key]["due_at"] = due_at
+        heapq.heappush(self.heap, (due_at, key))
+
+    def sync_targets(self, targets, now):
+        # targets: {key: name}. New keys start at their own offset within the
+        # shortest interval so a classroom of fresh submissions doesn't fire
+        # at once.
+        for key in list(self.targets):
+            if key not in targets:
+                del self.targets[key]
+        added = [key for key in targets if key not in self.targets]
+        for key in added:
+            self.targets[key] = {
+                "name": targets[key],
+                "interval": self.min_interval,
+                "sync": None,
+                "checked_at": None,
+            }
+            self._push(key, now + spread_offset(key, self.min_interval))
+        for key, name in targets.items():
+            self.targets[key]["name"] = name
+        if len(self.heap) > 4 * len(self.targets) + 64:
+            self.heap = [(entry["due_at"], key) for key, entry in self.targets.items()]
+            heapq.heapify(self.heap)
+        return added
+
+    def reset(self, now):
+        for key, entry in self.targets.items():
+            entry["interval"] = self.min_interval
+            self._push(key, now + spread_offset(key, self.min_interval))
+
+    def pop_due(self, now):
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            due_at, key = heapq.heappop(self.heap)
+            entry = self.targets.get(key)
+            if entry is not None and entry["due_at"] == due_at:
+                due.append(key)
+        return due
+
+    def observe(self, key, sync_status, now):
+        # Mismatching, unknown or just-changed targets are being worked on, so
+        # they go back to the shortest interval; each stable match doubles it.
+        entry = self.targets[key]
+        if sync_status is True and entry["sync"] is True:
+            entry["interval"] = min(self.max_interval, entry["interval"] * 2)
+        else:
+            entry["interval"] = self.min_interval
+        entry["sync"] = sync_status
+        # Jitter keeps targets that share an interval from drifting back into
+        # lockstep after a burst of simultaneous status changes.
+        self._push(key, now + jittered(entry["interval"], self.jitter_ratio))
+        return entry["interval"]
+
+    def defer(self, key, now):
+        # A compare was just queued: its result feeds back through
+        # record_result(). Until then check again after the current interval,
+        # in case the job fails and no result ever lands.
+        entry = self.targets[key]
+        self._push(key, now + jittered(entry["interval"], self.jitter_ratio))
+
+    def record_result(self, key, sync_status, checked_at, now):
+        # Called with the target's latest stored result; only a new check
+        # (a changed checked_at) reschedules it. The first one seen just sets
+        # the starting point, so a restart doesn't reschedule every target.
+        entry = self.targets.get(key)
+        if entry is None or checked_at is None or checked_at == entry["checked_at"]:
+            return None
+        first = entry["checked_at"] is None
+        entry["checked_at"] = checked_at
+        if first:
+            entry["sync"] = sync_status
+            return None
+        return self.observe(key, sync_status, now)
+
+    def next_due(self):
+        while self.heap:
+            due_at, key = self.heap[0]
+            entry = self.targets.get(key)
+            if entry is not None and entry["due_at"] == due_at:
+                return due_at
+            heapq.heappop(self.heap)
+        return None
@@ -1,4 +1,5 @@
 import json
+import time
 import urllib.error
 import urllib.request
 
@@ -95,8 +96,10 @@ def compare_endpoints(baseline_url, target_url, endpoints):
             continue
         if not endpoint.startswith("/"):
             endpoint = "/" + endpoint
+        started_at = time.time()
         base_payload, base_err = fetch_json(f"{baseline_url}{endpoint}")
         target_payload, target_err = fetch_json(f"{target_url}{endpoint}")
+        elapsed_ms = int((time.time() - started_at) * 1000)
 
         if base_err or target_err:
             all_ok = False
@@ -106,13 +109,14 @@ def compare_endpoints(baseline_url, target_url, endpoints):
                     "status": "error",
                     "baseline_error": base_err,
                     "target_error": target_err,
+                    "elapsed_ms": elapsed_ms,
                 }
             )
             continue
 
         ok, detail = compare_payloads(base_payload, target_payload)
         if ok:
-            results.append({"endpoint": endpoint, "status": "match"})
+            results.append({"endpoint": endpoint, "status": "match", "elapsed_ms": elapsed_ms})
             continue
 
         all_ok = False
@@ -127,6 +131,7 @@ def compare_endpoints(baseline_url, target_url, endpoints):
                     "extra": extra,
                     "missing_count": len(missing),
                     "extra_count": len(extra),
+                    "elapsed_ms": elapsed_ms,
                 }
             )
         else:
@@ -135,6 +140,7 @@ def compare_endpoints(baseline_url, target_url, endpoints):
                     "endpoint": endpoint,
                     "status": "mismatch",
                     "detail": detail,
+                    "elapsed_ms": elapsed_ms,
                 }
             )
 
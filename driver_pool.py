@@ -0,0 +1,157 @@
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+RESET_STORAGE_SCRIPT = """
+try { window.localStorage.clear(); } catch (e) {}
+try { window.sessionStorage.clear(); } catch (e) {}
+"""
+
+
+def url_origin(url):
+    parsed = urlparse(url or "")
+    if parsed.scheme not in {"http", "https"} or not parsed.netloc:
+        return None
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+class DriverPool:
+    # Keeps up to `size` browsers alive between fill sessions. A driver goes
+    # back to the idle list after its cookies and storage are wiped, and is
+    # quit instead once it has served `max_uses` sessions or a session failed.
+    def __init__(self, factory, size=1, max_uses=25):
+        self.factory = factory
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self.idle = []
+        self.alive = 0
+        self.closed = False
+        self.cond = threading.Condition()
+        self.launched = 0
+        self.reused = 0
+        self.recycled = 0
+
+    def prewarm(self):
+        while True:
+            with self.cond:
+                if self.closed or self.alive >= self.size:
+                    return
+                self.alive += 1
+            try:
+                driver = self.factory()
+            except Exception:
+                with self.cond:
+                    self.alive -= 1
+                    self.cond.notify()
+                raise
+            with self.cond:
+                self.launched += 1
+                self.idle.append([driver, 0])
+                self.cond.notify()
+
+    def acquire(self):
+        with self.cond:
+            while True:
+                if self.closed:
+                    raise RuntimeError("driver pool is shut down")
+                if self.idle:
+                    self.reused += 1
+                    return self.idle.pop()
+                if self.alive < self.size:
+                    self.alive += 1
+                    break
+                self.cond.wait()
+        try:
+            driver = self.factory()
+        except Exception:
+            with self.cond:
+                self.alive -= 1
+                self.cond.notify()
+            raise
+        with self.cond:
+            self.launched += 1
+        return [driver, 0]
+
+    def release(self, slot, urls=(), failed=False):
+        slot[1] += 1
+        keep = not failed and slot[1] < self.max_uses and not self.closed
+        if keep:
+            keep = self.reset(slot[0], urls)
+        if not keep:
+            self.discard(slot)
+            return
+        with self.cond:
+            self.idle.append(slot)
+            self.cond.notify()
+
+    def discard(self, slot):
+        try:
+            slot[0].quit()
+        except Exception:
+            pass
+        with self.cond:
+            self.alive -= 1
+            self.recycled += 1
+            self.cond.notify()
+
+    def reset(self, driver, urls=()):
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            origins = {url_origin(url) for url in [*urls, driver.current_url]}
+            origins.discard(None)
+            try:
+                driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+                for origin in origins:
+                    driver.execute_cdp_cmd(
+                        "Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"}
+                    )
+            except AttributeError:
+                # Non-Chromium drivers: only the current page's origin can be
+                # reached from here.
+                driver.delete_all_cookies()
+                driver.execute_script(RESET_STORAGE_SCRIPT)
+            driver.get("about:blank")
+        except Exception:
+            return False
+        return True
+
+    @contextmanager
+    def session(self, urls=()):
+        slot = self.acquire()
+        failed = False
+        try:
+            yield slot[0]
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.release(slot, urls, failed=failed)
+
+    def has_idle(self):
+        with self.cond:
+            return bool(self.idle)
+
+    def shutdown(self):
+        with self.cond:
+            self.closed = True
+            idle = list(self.idle)
+            self.idle.clear()
+            self.cond.notify_all()
+        for slot in idle:
+            self.discard(slot)
+
+    def stats(self):
+        with self.cond:
+            return {
+                "size": self.size,
+                "alive": self.alive,
+                "idle": len(self.idle),
+                "launched": self.launched,
+                "reused": self.reused,
+                "recycled": self.recycled,
+            }
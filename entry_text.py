@@ -0,0 +1,206 @@
+import json
+import os
+import threading
+import time
+import urllib.request
+from collections import deque
+
+
+DEFAULT_API_URL = "https://api.openai.com/v1/chat/completions"
+LOCAL_ENTRIES = [
+    "A short walk outside helped clear my head today.",
+    "I finished a tough task and felt relieved afterward.",
+    "I paused for a deep breath and noticed the sunlight.",
+    "A kind message from a friend lifted my mood.",
+    "I cooked something simple and felt grounded.",
+    "I focused for 25 minutes and made good progress.",
+    "I listened to music and felt more present.",
+]
+FALLBACK_ENTRIES = [
+    "I took a mindful pause and reset my focus.",
+    "Small progress today felt meaningful.",
+    "A calm moment made the day feel lighter.",
+]
+
+loaded_env_paths = set()
+env_lock = threading.Lock()
+shared_pool = None
+pool_configured = False
+shared_pool_lock = threading.Lock()
+
+
+def load_env(path=".env"):
+    # Read once per process; variables already in the environment win.
+    with env_lock:
+        if path in loaded_env_paths:
+            return
+        loaded_env_paths.add(path)
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                for line in handle:
+                    line = line.strip()
+                    if not line or line.startswith("#") or "=" not in line:
+                        continue
+                    key, value = line.split("=", 1)
+                    key = key.strip()
+                    value = value.strip().strip("\"'")
+                    if key and key not in os.environ:
+                        os.environ[key] = value
+        except OSError:
+            pass
+
+
+def request_entry_text(api_url, api_key, model="gpt-4o-mini", timeout=20):
+    payload = {
+        "model": model,
+        "messages": [
+            {
+                "role": "system",
+                "content": "Write a single short, uplifting daily note (max 140 chars).",
+            },
+            {"role": "user", "content": "Generate a fresh, human-sounding entry."},
+        ],
+        "temperature": 0.8,
+    }
+    headers = {"Content-Type": "application/json"}
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+    req = urllib.request.Request(
+        api_url,
+        data=json.dumps(payload).encode("utf-8"),
+        headers=headers,
+        method="POST",
+    )
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        data = json.loads(resp.read().decode("utf-8"))
+    text = data["choices"][0]["message"]["content"]
+    text = " ".join(str(text).split())
+    if not text:
+        raise ValueError("empty entry text")
+    return text
+
+
+class EntryTextPool:
+    # Keeps up to `size` generated texts ready. take() never blocks: it hands
+    # out a pooled text younger than `ttl` seconds, or None when the pool is
+    # empty, and wakes the background thread to top the pool back up. After
+    # `idle_seconds` without a start() or take() the thread stops generating
+    # until the next one, so an unused pool does not keep calling the API.
+    def __init__(self, generate, size=8, ttl=3600, retry_seconds=30, idle_seconds=900):
+        self.generate = generate
+        self.size = max(1, size)
+        self.ttl = ttl
+        self.retry_seconds = retry_seconds
+        self.idle_seconds = idle_seconds
+        self.ready = deque()
+        self.cond = threading.Condition()
+        self.thread = None
+        self.closed = False
+        self.last_used = time.time()
+        self.generated = 0
+        self.served = 0
+        self.missed = 0
+        self.expired = 0
+        self.errors = 0
+
+    def start(self):
+        with self.cond:
+            self.last_used = time.time()
+            if self.thread is None and not self.closed:
+                self.thread = threading.Thread(
+                    target=self.refill, name="entry-text-pool", daemon=True
+                )
+                self.thread.start()
+            self.cond.notify()
+
+    def drop_expired(self, now):
+        while self.ready and now - self.ready[0][1] > self.ttl:
+            self.ready.popleft()
+            self.expired += 1
+
+    def take(self):
+        self.start()
+        with self.cond:
+            self.drop_expired(time.time())
+            if not self.ready:
+                self.missed += 1
+                return None
+            self.served += 1
+            text = self.ready.popleft()[0]
+            self.cond.notify()
+            return text
+
+    def refill(self):
+        failures = 0
+        while True:
+            with self.cond:
+                while not self.closed:
+                    now = time.time()
+                    self.drop_expired(now)
+                    if now - self.last_used > self.idle_seconds:
+                        # Idle: sleep until start() or take() wakes us.
+                        self.cond.wait()
+                        continue
+                    if len(self.ready) < self.size:
+                        break
+                    # Wake up again when the oldest text is due to expire.
+                    self.cond.wait(max(1, self.ttl - (time.time() - self.ready[0][1])))
+                if self.closed:
+                    return
+            try:
+                text = self.generate()
+            except Exception as exc:
+                failures += 1
+                with self.cond:
+                    self.errors += 1
+                print(f"[entry-text] generation failed: {exc}", flush=True)
+                delay = min(self.retry_seconds * 2 ** (failures - 1), 600)
+                with self.cond:
+                    self.cond.wait_for(lambda: self.closed, timeout=delay)
+                continue
+            failures = 0
+            with self.cond:
+                self.ready.append((text, time.time()))
+                self.generated += 1
+
+    def shutdown(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def stats(self):
+        with self.cond:
+            return {
+                "size": self.size,
+                "ready": len(self.ready),
+                "idle": time.time() - self.last_used > self.idle_seconds,
+                "generated": self.generated,
+                "served": self.served,
+                "missed": self.missed,
+                "expired": self.expired,
+                "errors": self.errors,
+            }
+
+
+def entry_text_pool():
+    # Built on first use so .env has been read before the config is. Stays
+    # None when there is no API key and no stand-in API URL to call.
+    global shared_pool, pool_configured
+    with shared_pool_lock:
+        if not pool_configured:
+            pool_configured = True
+            load_env()
+            api_url = os.environ.get("ENTRY_TEXT_API_URL", DEFAULT_API_URL)
+            api_key = os.environ.get("OPENAI_API_KEY", "").strip()
+            if api_key or api_url != DEFAULT_API_URL:
+                model = os.environ.get("ENTRY_TEXT_MODEL", "gpt-4o-mini")
+                timeout = float(os.environ.get("ENTRY_TEXT_TIMEOUT_SECONDS", "20"))
+                shared_pool = EntryTextPool(
+                    lambda: request_entry_text(api_url, api_key, model, timeout),
+                    size=int(os.environ.get("ENTRY_TEXT_POOL_SIZE", "8")),
+                    ttl=float(os.environ.get("ENTRY_TEXT_TTL_SECONDS", "3600")),
+                    idle_seconds=float(os.environ.get("ENTRY_TEXT_IDLE_SECONDS", "900")),
+                )
+        return shared_pool
@@ -0,0 +1,186 @@
+import json
+import math
+import time
+from contextlib import contextmanager
+
+
+class FillTrace:
+    # Span-style timings for one fill. Each span records its phase name, when
+    # it started relative to the trace and how long it took, so a slow fill
+    # can be broken down into driver startup, page loads, typing and waits.
+    def __init__(self):
+        self.started_at = time.time()
+        self.origin = time.perf_counter()
+        self.spans = []
+
+    def add(self, name, start, **attrs):
+        # `start` is a time.perf_counter() reading; the span ends now.
+        end = time.perf_counter()
+        self.spans.append(
+            {
+                "name": name,
+                "start_ms": round((start - self.origin) * 1000, 1),
+                "duration_ms": round((end - start) * 1000, 1),
+                **attrs,
+            }
+        )
+
+    @contextmanager
+    def span(self, name, **attrs):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, **attrs)
+
+    def duration_ms(self):
+        return round((time.perf_counter() - self.origin) * 1000, 1)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    # Nearest-rank: the smallest value with at least `fraction` of them at or below it.
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "total_ms": round(sum(values), 1),
+        "mean_ms": round(sum(values) / len(values), 1) if values else None,
+        "p50_ms": percentile(values, 0.5),
+        "p95_ms": percentile(values, 0.95),
+        "max_ms": max(values) if values else None,
+    }
+
+
+def encode_spans(spans):
+    # [name, start_ms, duration_ms] plus an attrs object only when present.
+    packed = []
+    for span in spans:
+        attrs = {
+            key: value
+            for key, value in span.items()
+            if key not in {"name", "start_ms", "duration_ms"}
+        }
+        item = [span["name"], span["start_ms"], span["duration_ms"]]
+        if attrs:
+            item.append(attrs)
+        packed.append(item)
+    return json.dumps(packed, separators=(",", ":"))
+
+
+def decode_spans(raw_value):
+    spans = []
+    for item in json.loads(raw_value or "[]"):
+        name, start_ms, duration_ms = item[:3]
+        attrs = item[3] if len(item) > 3 else {}
+        spans.append({"name": name, "start_ms": start_ms, "duration_ms": duration_ms, **attrs})
+    return spans
+
+
+def record_fill_trace(conn, lab_id, batch, target_url, target_name, engine, trace, error=None):
+    conn.execute(
+        """
+        INSERT INTO fill_traces (
+            lab_id, batch, target_url, target_name, engine, status,
+            started_at, duration_ms, spans, error
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            lab_id,
+            batch,
+            target_url,
+            target_name,
+            engine,
+            "error" if error else "ok",
+            trace.started_at,
+            trace.duration_ms(),
+            encode_spans(trace.spans),
+            error,
+        ),
+    )
+
+
+def decode_trace(row):
+    return {
+        "id": row["id"],
+        "batch": row["batch"],
+        "url": row["target_url"],
+        "name": row["target_name"],
+        "engine": row["engine"],
+        "status": row["status"],
+        "started_at": row["started_at"],
+        "duration_ms": row["duration_ms"],
+        "spans": decode_spans(row["spans"]),
+        "error": row["error"],
+    }
+
+
+def list_fill_traces(conn, lab_id, batch=None, target_url=None, limit=50):
+    clauses = ["lab_id = ?"]
+    params = [lab_id]
+    if batch:
+        clauses.append("batch = ?")
+        params.append(batch)
+    if target_url:
+        clauses.append("target_url = ?")
+        params.append(target_url)
+    rows = conn.execute(
+        f"""
+        SELECT id, batch, target_url, target_name, engine, status,
+               started_at, duration_ms, spans, error
+        FROM fill_traces
+        WHERE {" AND ".join(clauses)}
+        ORDER BY started_at DESC
+        LIMIT ?
+        """,
+        (*params, limit),
+    ).fetchall()
+    return [decode_trace(row) for row in rows]
+
+
+def cycle_stats(traces):
+    # Aggregates over every fill in one cycle: per engine and per phase, so
+    # the slowest phase across a classroom stands out.
+    phases = {}
+    engines = {}
+    for trace in traces:
+        engines.setdefault(trace["engine"], []).append(trace["duration_ms"])
+        for span in trace["spans"]:
+            phases.setdefault(span["name"], []).append(span["duration_ms"])
+    started = [trace["started_at"] for trace in traces]
+    finished = [trace["started_at"] + trace["duration_ms"] / 1000 for trace in traces]
+    return {
+        "fills": len(traces),
+        "errors": sum(1 for trace in traces if trace["status"] == "error"),
+        "started_at": min(started) if started else None,
+        "wall_ms": round((max(finished) - min(started)) * 1000, 1) if traces else None,
+        "fill_ms": summarize([trace["duration_ms"] for trace in traces]),
+        "engines": {engine: summarize(values) for engine, values in engines.items()},
+        "phases": {name: summarize(values) for name, values in sorted(phases.items())},
+    }
+
+
+def recent_cycles(conn, lab_id, limit=10):
+    rows = conn.execute(
+        """
+        SELECT batch, MIN(started_at) AS started_at
+        FROM fill_traces
+        WHERE lab_id = ? AND batch IS NOT NULL
+        GROUP BY batch
+        ORDER BY started_at DESC
+        LIMIT ?
+        """,
+        (lab_id, limit),
+    ).fetchall()
+    return [row["batch"] for row in rows]
+
+
+def prune_fill_traces(conn, before):
+    cursor = conn.execute("DELETE FROM fill_traces WHERE started_at < ?", (before,))
+    return cursor.rowcount
@@ -4,55 +4,487 @@ import random
 import string
 import sys
 import time
-import urllib.request
-import urllib.error
+from urllib.parse import urlparse
 
 from selenium import webdriver
 from selenium.common.exceptions import (
     ElementClickInterceptedException,
     ElementNotInteractableException,
     StaleElementReferenceException,
+    TimeoutException,
+    WebDriverException,
 )
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
 from compare_utils import DEFAULT_COMPARE_ENDPOINTS, compare_endpoints
+from driver_pool import DriverPool
+from entry_text import FALLBACK_ENTRIES, LOCAL_ENTRIES, entry_text_pool
+from fill_traces import FillTrace
+from http_replay import collect_recorded, install_recorder
+
+DRIVER_POOL = None
+SETTLE_IDLE_MS = int(os.environ.get("FILL_SETTLE_IDLE_MS", "150"))
+SETTLE_TIMEOUT_SECONDS = float(os.environ.get("FILL_SETTLE_TIMEOUT_SECONDS", "5"))
+NAVIGATION_GRACE_MS = int(os.environ.get("FILL_NAVIGATION_GRACE_MS", "2000"))
+LEAN_BROWSER = os.environ.get("FILL_LEAN_BROWSER", "true").lower() == "true"
+DEFAULT_BLOCKED_URLS = [
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.webp",
+    "*.svg",
+    "*.ico",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    "*.mp3",
+    "*.mp4",
+    "*.webm",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*facebook.net*",
+    "*hotjar.com*",
+    "*segment.io*",
+    "*fonts.googleapis.com*",
+    "*fonts.gstatic.com*",
+]
+BLOCKED_URLS = [
+    item.strip()
+    for item in os.environ.get("FILL_BLOCKED_URLS", ",".join(DEFAULT_BLOCKED_URLS)).split(",")
+    if item.strip()
+]
+LEAN_BROWSER_ARGS = [
+    "--disable-extensions",
+    "--disable-gpu",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-features=Translate,MediaRouter,OptimizationHints",
+    "--disable-site-isolation-trials",
+    "--renderer-process-limit=2",
+    "--blink-settings=imagesEnabled=false",
+    "--mute-audio",
+    "--no-first-run",
+]
+
+# Counts in-flight fetch/XHR calls and remembers when the DOM last changed, so
+# the filler can wait for the page to go quiet instead of sleeping blindly.
+ACTIVITY_TRACKER_SCRIPT = """
+if (window.__fillActivity) { return; }
+var graceMs = arguments[0];
+var activity = { inflight: 0, lastChange: performance.now(), navigating: false };
+window.__fillActivity = activity;
+function touch() { activity.lastChange = performance.now(); }
+function settle() { activity.inflight = Math.max(0, activity.inflight - 1); touch(); }
+if (window.fetch) {
+  var originalFetch = window.fetch;
+  window.fetch = function () {
+    activity.inflight += 1;
+    touch();
+    try {
+      var pending = originalFetch.apply(this, arguments);
+      pending.then(settle, settle);
+      return pending;
+    } catch (e) {
+      settle();
+      throw e;
+    }
+  };
+}
+var send = XMLHttpRequest.prototype.send;
+XMLHttpRequest.prototype.send = function () {
+  activity.inflight += 1;
+  touch();
+  this.addEventListener("loadend", settle);
+  try {
+    return send.apply(this, arguments);
+  } catch (e) {
+    settle();
+    throw e;
+  }
+};
+new MutationObserver(touch).observe(document, {
+  subtree: true, childList: true, attributes: true, characterData: true
+});
+// A native form post (or form.submit(), or any other navigation) sends its
+// request from the browser, not through fetch/XHR: remember that one is
+// pending so the page is never reported idle while it's on its way. A
+// submit that never unloads the page (a 204 reply, target=_blank, cancelled
+// by a later handler) clears the flag again after graceMs.
+var leaveTimer = null;
+function stay() { activity.navigating = false; touch(); }
+function leaving() {
+  activity.navigating = true;
+  touch();
+  clearTimeout(leaveTimer);
+  leaveTimer = setTimeout(stay, graceMs);
+}
+window.addEventListener("submit", function (event) {
+  if (!event.defaultPrevented) { leaving(); }
+});
+window.addEventListener("beforeunload", leaving);
+window.addEventListener("pagehide", leaving);
+// Back from the back/forward cache: whatever was leaving didn't.
+window.addEventListener("pageshow", function (event) {
+  if (event.persisted) { clearTimeout(leaveTimer); stay(); }
+});
+"""
+
+SETTLE_SCRIPT = """
+var done = arguments[arguments.length - 1];
+var idleMs = arguments[0];
+var limitMs = arguments[1];
+var started = performance.now();
+(function check() {
+  var activity = window.__fillActivity;
+  var now = performance.now();
+  if (!activity) { return done("reloaded"); }
+  if (!activity.navigating && activity.inflight === 0 && now - activity.lastChange >= idleMs) {
+    return done("idle");
+  }
+  if (now - started >= limitMs) { return done("timeout"); }
+  setTimeout(check, 25);
+})();
+"""
+
+# One round trip returns the metadata of every field in every container;
+# Python then picks the values and APPLY_FIELDS_SCRIPT writes them in a second
+# round trip per container, instead of several WebDriver calls per field.
+EXTRACT_FIELDS_SCRIPT = """
+return arguments[0].map(function (container) {
+  var fields = container.querySelectorAll("input, textarea, select");
+  return {
+    id: (container.getAttribute("id") || "").toLowerCase(),
+    name: (container.getAttribute("name") || "").toLowerCase(),
+    action: container.getAttribute("action") || "",
+    fields: Array.prototype.map.call(fields, function (el, index) {
+      var options = [];
+      if (el.tagName === "SELECT") {
+        options = Array.prototype.map.call(el.options, function (option, optionIndex) {
+          return { index: optionIndex, value: option.value, text: option.text.trim() };
+        });
+      }
+      return {
+        index: index,
+        tag: el.tagName.toLowerCase(),
+        type: (el.getAttribute("type") || "text").toLowerCase(),
+        name: (el.getAttribute("name") || "").toLowerCase(),
+        placeholder: (el.getAttribute("placeholder") || "").toLowerCase(),
+        id: (el.getAttribute("id") || "").toLowerCase(),
+        value: el.getAttribute("value") || "",
+        checked: !!el.checked,
+        usable: !el.disabled && !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length),
+        options: options
+      };
+    })
+  };
+});
+"""
+
+APPLY_FIELDS_SCRIPT = """
+var fields = arguments[0].querySelectorAll("input, textarea, select");
+var applied = 0;
+function fire(el, type) {
+  el.dispatchEvent(new Event(type, { bubbles: true }));
+}
+arguments[1].forEach(function (action) {
+  var el = fields[action.index];
+  if (!el || el.disabled) { return; }
+  if (action.kind === "click") {
+    el.click();
+  } else if (action.kind === "select") {
+    el.selectedIndex = action.option;
+    fire(el, "input");
+    fire(el, "change");
+  } else {
+    // Go through the prototype setter so framework-controlled inputs
+    // (React and friends) see the change in their input handlers.
+    var proto = el.tagName === "TEXTAREA"
+      ? HTMLTextAreaElement.prototype
+      : HTMLInputElement.prototype;
+    var setter = Object.getOwnPropertyDescriptor(proto, "value").set;
+    el.focus();
+    setter.call(el, action.value);
+    fire(el, "input");
+    fire(el, "change");
+    el.blur();
+  }
+  applied += 1;
+});
+return applied;
+"""
+
+
+def rand_string(min_len=6, max_len=12, rng=random):
+    length = rng.randint(min_len, max_len)
+    return "".join(rng.choices(string.ascii_letters, k=length))
+
+
+def rand_email(rng=random):
+    return f"{rand_string(5, 8, rng).lower()}@example.com"
+
+
+def rand_phone(rng=random):
+    return f"555{rng.randint(1000000, 9999999)}"
+
+
+def rand_number(min_val=1, max_val=100, rng=random):
+    return str(rng.randint(min_val, max_val))
+
+
+def rand_date(rng=random):
+    return f"2024-{rng.randint(1,12):02d}-{rng.randint(1,28):02d}"
 
-ENTRY_MODE = "ai"
-ENTRY_TEXT = None
 
+def safe_clear_and_type(el, value):
+    try:
+        el.clear()
+    except Exception:
+        pass
+    el.send_keys(value)
 
-def rand_string(min_len=6, max_len=12):
-    length = random.randint(min_len, max_len)
-    return "".join(random.choices(string.ascii_letters, k=length))
 
+def input_value(el_type, name, placeholder, el_id, ctx, rng=None):
+    rng = rng or ctx.rng
+    if "entry-input" in el_id:
+        return get_entry_text(ctx)
+    if "email" in name or "email" in placeholder or el_type == "email":
+        return rand_email(rng)
+    if "phone" in name or "phone" in placeholder or el_type == "tel":
+        return rand_phone(rng)
+    if el_type == "number":
+        return rand_number(rng=rng)
+    if el_type == "date":
+        return rand_date(rng)
+    if "name" in name or "name" in placeholder:
+        return rand_string(4, 10, rng).title()
+    if "city" in name or "city" in placeholder:
+        return "Austin"
+    if "zip" in name or "postal" in placeholder:
+        return rand_number(10000, 99999, rng)
+    return rand_string(rng=rng)
+
+
+class FillContext:
+    # Everything one fill session needs that used to live in module globals,
+    # so fills running in parallel threads can't reseed or retarget each other.
+    def __init__(
+        self, seed=None, mode="all", entry_mode="ai", entry_text=None, log_cb=None, trace=None
+    ):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.mode = mode
+        self.entry_mode = entry_mode
+        self.entry_text = entry_text
+        self.log = log_cb or (lambda message: None)
+        self.trace = trace or FillTrace()
+
+
+def dedupe_keys(keys):
+    seen = {}
+    unique = []
+    for key in keys:
+        seen[key] = seen.get(key, 0) + 1
+        unique.append(key if seen[key] == 1 else f"{key}~{seen[key]}")
+    return unique
+
+
+def container_keys(kind, containers):
+    keys = []
+    for index, container in enumerate(containers):
+        if container["id"]:
+            keys.append(f"{kind}#{container['id']}")
+        elif container["name"]:
+            keys.append(f"{kind}[name={container['name']}]")
+        elif urlparse(container["action"]).path:
+            # Path only: the baseline and student apps live on different hosts.
+            keys.append(f"{kind}[action={urlparse(container['action']).path}]")
+        else:
+            keys.append(f"{kind}:{index}")
+    return dedupe_keys(keys)
+
+
+def field_keys(fields):
+    # Identify fields by what the markup says about them rather than by
+    # position, so a student app that orders or wraps fields differently
+    # still gets the same value in the same field.
+    keys = []
+    for field in fields:
+        if field["id"]:
+            key = f"#{field['id']}"
+        elif field["name"]:
+            key = f"{field['tag']}[name={field['name']}]"
+            if field["type"] in {"radio", "checkbox"}:
+                key = f"{key}[value={field['value']}]"
+        elif field["placeholder"]:
+            key = f"{field['tag']}[placeholder={field['placeholder']}]"
+        else:
+            key = f"{field['tag']}:{field['type']}"
+        keys.append(key)
+    return dedupe_keys(keys)
+
+
+class FillPlan:
+    # The values one fill cycle submits, keyed per iteration by container key
+    # and field key. The baseline run fills it in; serialized with to_dict()
+    # it travels to every student fill, which reuses the same values. Values
+    # for fields the plan hasn't seen come from an RNG seeded by the plan seed
+    # and the field's keys, so they are reproducible too.
+    def __init__(self, seed=None, entry_text=None, pages=None):
+        self.seed = seed if seed is not None else random.randrange(2**31)
+        self.entry_text = entry_text
+        self.pages = pages or []
+
+    def to_dict(self):
+        return {"seed": self.seed, "entry_text": self.entry_text, "pages": self.pages}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("seed"), data.get("entry_text"), data.get("pages"))
+
+    def rng(self, *parts):
+        return random.Random("|".join(str(part) for part in (self.seed, *parts)))
+
+    def page(self, iteration):
+        while len(self.pages) <= iteration:
+            self.pages.append({})
+        return self.pages[iteration]
+
+    def pick_containers(self, iteration, keys, mode):
+        known = [key for key in keys if key in self.page(iteration)]
+        if known:
+            return known
+        if mode == "all" or not keys:
+            return list(keys)
+        return [self.rng(iteration, "containers").choice(keys)]
+
+    def choose(self, iteration, container_key, field_key, field, ctx):
+        rng = self.rng(iteration, container_key, field_key)
+        if field["tag"] == "textarea":
+            return {"kind": "value", "value": f"Notes {rand_string(8, 15, rng)}"}
+        if field["tag"] == "select":
+            candidates = [
+                option for option in field["options"] if option["value"] or option["text"]
+            ]
+            if not candidates:
+                return None
+            choice = rng.choice(candidates)
+            return {"kind": "select", "value": choice["value"], "text": choice["text"]}
+        if field["type"] in {"hidden", "submit", "button", "reset", "image", "file"}:
+            return None
+        if field["type"] == "checkbox":
+            return {"kind": "check"} if rng.random() > 0.5 else None
+        if field["type"] == "radio":
+            return {"kind": "check"}
+        value = input_value(
+            field["type"], field["name"], field["placeholder"], field["id"], ctx, rng=rng
+        )
+        return {"kind": "value", "value": value}
 
-def rand_email():
-    return f"{rand_string(5, 8).lower()}@example.com"
+    def actions_for(self, iteration, container_key, fields, ctx):
+        planned = self.page(iteration).setdefault(container_key, {})
+        actions = []
+        for field_key, field in zip(field_keys(fields), fields):
+            if not field["usable"]:
+                continue
+            if field_key not in planned:
+                planned[field_key] = self.choose(iteration, container_key, field_key, field, ctx)
+            step = planned[field_key]
+            if step is None:
+                continue
+            if step["kind"] == "value":
+                actions.append({"index": field["index"], "kind": "value", "value": step["value"]})
+            elif step["kind"] == "check":
+                if not field["checked"]:
+                    actions.append({"index": field["index"], "kind": "click"})
+            elif step["kind"] == "select":
+                for option in field["options"]:
+                    if (option["value"], option["text"]) == (step["value"], step["text"]):
+                        actions.append(
+                            {"index": field["index"], "kind": "select", "option": option["index"]}
+                        )
+                        break
+        return actions
+
+
+def extract_fields(driver, containers):
+    if not containers:
+        return []
+    try:
+        return driver.execute_script(EXTRACT_FIELDS_SCRIPT, containers)
+    except WebDriverException:
+        return None
 
 
-def rand_phone():
-    return f"555{random.randint(1000000, 9999999)}"
+def fill_container(driver, container, actions, fallback, ctx):
+    # Returns False when the container left the page (e.g. a previous submit
+    # re-rendered it), so the caller does not submit it unfilled.
+    try:
+        if actions is not None:
+            try:
+                driver.execute_script(APPLY_FIELDS_SCRIPT, container, actions)
+                return True
+            except StaleElementReferenceException:
+                raise
+            except WebDriverException:
+                pass
+        fallback(container, ctx)
+    except StaleElementReferenceException:
+        ctx.log("Form or row went stale before it was filled; skipping its submit.")
+        return False
+    return True
 
 
-def rand_number(min_val=1, max_val=100):
-    return str(random.randint(min_val, max_val))
+def track_activity(driver):
+    try:
+        driver.execute_script(ACTIVITY_TRACKER_SCRIPT, NAVIGATION_GRACE_MS)
+    except WebDriverException:
+        pass
 
 
-def rand_date():
-    return f"2024-{random.randint(1,12):02d}-{random.randint(1,28):02d}"
+def wait_for_document(driver):
+    # After a navigation: wait until the response has arrived and the new
+    # document is parsed, so the post behind it has reached the server.
+    def ready(driver):
+        try:
+            return driver.execute_script("return document.readyState") != "loading"
+        except WebDriverException:
+            return False
 
+    try:
+        WebDriverWait(driver, SETTLE_TIMEOUT_SECONDS, poll_frequency=0.05).until(ready)
+    except TimeoutException:
+        return False
+    return True
 
-def safe_clear_and_type(el, value):
+
+def wait_for_settle(driver, idle_ms=None):
+    # Returns once no request is in flight, no navigation is pending and the
+    # DOM has been quiet for idle_ms, bounded by SETTLE_TIMEOUT_SECONDS. A
+    # native form post replaces the page mid-wait; the new page gets its own
+    # tracker once it has loaded.
+    idle_ms = SETTLE_IDLE_MS if idle_ms is None else idle_ms
     try:
-        el.clear()
-    except Exception:
-        pass
-    el.send_keys(value)
+        driver.set_script_timeout(SETTLE_TIMEOUT_SECONDS + 5)
+        result = driver.execute_async_script(
+            SETTLE_SCRIPT, idle_ms, int(SETTLE_TIMEOUT_SECONDS * 1000)
+        )
+    except WebDriverException:
+        result = "reloaded"
+    if result == "reloaded":
+        if not wait_for_document(driver):
+            return "timeout"
+        track_activity(driver)
+    return result
 
 
-def fill_input(el):
+def fill_input(el, ctx):
     el_type = (el.get_attribute("type") or "text").lower()
     name = (el.get_attribute("name") or "").lower()
     placeholder = (el.get_attribute("placeholder") or "").lower()
@@ -61,7 +493,7 @@ def fill_input(el):
         return
 
     if el_type in {"checkbox"}:
-        if random.random() > 0.5 and not el.is_selected():
+        if ctx.rng.random() > 0.5 and not el.is_selected():
             el.click()
         return
 
@@ -70,40 +502,22 @@ def fill_input(el):
             el.click()
         return
 
-    if "entry-input" in (el.get_attribute("id") or "").lower():
-        value = get_entry_text()
-    elif "email" in name or "email" in placeholder or el_type == "email":
-        value = rand_email()
-    elif "phone" in name or "phone" in placeholder or el_type == "tel":
-        value = rand_phone()
-    elif el_type == "number":
-        value = rand_number()
-    elif el_type == "date":
-        value = rand_date()
-    elif "name" in name or "name" in placeholder:
-        value = rand_string(4, 10).title()
-    elif "city" in name or "city" in placeholder:
-        value = "Austin"
-    elif "zip" in name or "postal" in placeholder:
-        value = rand_number(10000, 99999)
-    else:
-        value = rand_string()
-
-    safe_clear_and_type(el, value)
-
-
-def fill_textarea(el):
-    safe_clear_and_type(el, f"Notes {rand_string(8, 15)}")
-
-
-def fill_select(el):
+    el_id = (el.get_attribute("id") or "").lower()
+    safe_clear_and_type(el, input_value(el_type, name, placeholder, el_id, ctx))
+
+
+def fill_textarea(el, ctx):
+    safe_clear_and_type(el, f"Notes {rand_string(8, 15, ctx.rng)}")
+
+
+def fill_select(el, ctx):
     options = el.find_elements(By.TAG_NAME, "option")
     if not options:
         return
     candidates = [opt for opt in options if opt.get_attribute("value") or opt.text.strip()]
     if not candidates:
         return
-    choice = random.choice(candidates)
+    choice = ctx.rng.choice(candidates)
     choice.click()
 
 
@@ -149,155 +563,136 @@ def submit_row(row, driver):
     safe_click(driver, buttons[0])
 
 
-def fill_form(form):
+def fill_form(form, ctx):
     elements = form.find_elements(By.CSS_SELECTOR, "input, textarea, select")
     for el in elements:
         try:
             tag = el.tag_name.lower()
             if tag == "input":
-                fill_input(el)
+                fill_input(el, ctx)
             elif tag == "textarea":
-                fill_textarea(el)
+                fill_textarea(el, ctx)
             elif tag == "select":
-                fill_select(el)
+                fill_select(el, ctx)
         except (ElementNotInteractableException, StaleElementReferenceException):
             continue
 
 
-def fill_row(row):
+def fill_row(row, ctx):
     elements = row.find_elements(By.CSS_SELECTOR, "input, textarea, select")
     for el in elements:
         try:
             tag = el.tag_name.lower()
             if tag == "input":
-                fill_input(el)
+                fill_input(el, ctx)
             elif tag == "textarea":
-                fill_textarea(el)
+                fill_textarea(el, ctx)
             elif tag == "select":
-                fill_select(el)
+                fill_select(el, ctx)
         except (ElementNotInteractableException, StaleElementReferenceException):
             continue
 
 
-def create_driver(headless):
+def create_driver(headless, lean=None):
+    lean = LEAN_BROWSER if lean is None else lean
     options = webdriver.ChromeOptions()
     if headless:
         options.add_argument("--headless=new")
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-dev-shm-usage")
-    return webdriver.Chrome(options=options)
-
-
-def load_env(path=".env"):
-    if not os.path.exists(path):
-        return
+    if lean:
+        # Forms are usable once the DOM is parsed; images, fonts and trackers
+        # are never needed, and fewer renderer processes keep memory down.
+        options.page_load_strategy = "eager"
+        for arg in LEAN_BROWSER_ARGS:
+            options.add_argument(arg)
+        options.add_experimental_option(
+            "prefs", {"profile.managed_default_content_settings.images": 2}
+        )
+    driver = webdriver.Chrome(options=options)
+    if lean:
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            if BLOCKED_URLS:
+                driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URLS})
+            driver.execute_cdp_cmd("Performance.enable", {})
+        except WebDriverException:
+            pass
+    return driver
+
+
+def browser_rss_mb(root_pid):
+    # Sums resident memory of chromedriver and every browser process under it
+    # (Linux /proc only).
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r", encoding="utf-8") as handle:
+                fields = handle.read().rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        parents[int(entry)] = (int(fields[1]), int(fields[21]))
+    family = {root_pid}
+    changed = True
+    while changed:
+        changed = False
+        for pid, (ppid, _) in parents.items():
+            if ppid in family and pid not in family:
+                family.add(pid)
+                changed = True
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    return sum(parents[pid][1] for pid in family if pid in parents) * page_size // (1024 * 1024)
+
+
+def memory_report(driver):
+    parts = []
     try:
-        with open(path, "r", encoding="utf-8") as handle:
-            for line in handle:
-                line = line.strip()
-                if not line or line.startswith("#") or "=" not in line:
-                    continue
-                key, value = line.split("=", 1)
-                key = key.strip()
-                value = value.strip().strip("\"'") 
-                if key and key not in os.environ:
-                    os.environ[key] = value
-    except OSError:
+        metrics = driver.execute_cdp_cmd("Performance.getMetrics", {})["metrics"]
+        values = {item["name"]: item["value"] for item in metrics}
+        if "JSHeapUsedSize" in values:
+            parts.append(
+                f"JS heap {values['JSHeapUsedSize'] / 1048576:.1f}"
+                f"/{values.get('JSHeapTotalSize', 0) / 1048576:.1f} MB"
+            )
+        if "Nodes" in values:
+            parts.append(f"{int(values['Nodes'])} DOM nodes")
+    except (WebDriverException, AttributeError, KeyError):
         pass
+    try:
+        parts.append(f"browser RSS {browser_rss_mb(driver.service.process.pid)} MB")
+    except (OSError, AttributeError, ValueError):
+        pass
+    return ", ".join(parts) or None
 
 
-def set_entry_text(value):
-    global ENTRY_TEXT
-    ENTRY_TEXT = value
-
+def configure_driver_pool(size, max_uses):
+    global DRIVER_POOL
+    DRIVER_POOL = DriverPool(lambda: create_driver(True), size=size, max_uses=max_uses)
+    return DRIVER_POOL
 
-def clear_entry_text():
-    global ENTRY_TEXT
-    ENTRY_TEXT = None
 
+def warm_driver_available():
+    return DRIVER_POOL is not None and DRIVER_POOL.has_idle()
 
-def get_entry_text():
-    load_env()
-    if ENTRY_TEXT is not None:
-        return ENTRY_TEXT
-    if ENTRY_MODE == "local":
-        return random.choice(
-            [
-                "A short walk outside helped clear my head today.",
-                "I finished a tough task and felt relieved afterward.",
-                "I paused for a deep breath and noticed the sunlight.",
-                "A kind message from a friend lifted my mood.",
-                "I cooked something simple and felt grounded.",
-                "I focused for 25 minutes and made good progress.",
-                "I listened to music and felt more present.",
-            ]
-        )
-    api_key = os.environ.get("OPENAI_API_KEY", "").strip()
-    if not api_key:
-        return random.choice(
-            [
-                "A short walk outside helped clear my head today.",
-                "I finished a tough task and felt relieved afterward.",
-                "I paused for a deep breath and noticed the sunlight.",
-                "A kind message from a friend lifted my mood.",
-                "I cooked something simple and felt grounded.",
-                "I focused for 25 minutes and made good progress.",
-                "I listened to music and felt more present.",
-            ]
-        )
-
-    payload = (
-        "{"
-        "\"model\":\"gpt-4o-mini\","
-        "\"messages\":["
-        "{\"role\":\"system\",\"content\":\"Write a single short, uplifting daily note (max 140 chars).\"},"
-        "{\"role\":\"user\",\"content\":\"Generate a fresh, human-sounding entry.\"}"
-        "],"
-        "\"temperature\":0.8"
-        "}"
-    ).encode("utf-8")
-
-    req = urllib.request.Request(
-        "https://api.openai.com/v1/chat/completions",
-        data=payload,
-        headers={
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}",
-        },
-        method="POST",
-    )
-
-    try:
-        with urllib.request.urlopen(req, timeout=20) as resp:
-            raw = resp.read().decode("utf-8")
-    except (urllib.error.URLError, urllib.error.HTTPError):
-        return random.choice(
-            [
-                "I took a mindful pause and reset my focus.",
-                "Small progress today felt meaningful.",
-                "A calm moment made the day feel lighter.",
-            ]
-        )
 
-    try:
-        marker = "\"content\":\""
-        start = raw.find(marker)
-        if start == -1:
-            return "A simple moment brought me peace today."
-        start += len(marker)
-        end = raw.find("\"", start)
-        text = raw[start:end]
-        return text.replace("\\n", " ").strip()
-    except Exception:
-        return "I appreciated a quiet moment and felt grateful."
+def get_entry_text(ctx=None):
+    ctx = ctx or FillContext()
+    if ctx.entry_text is not None:
+        return ctx.entry_text
+    if ctx.entry_mode == "local":
+        return ctx.rng.choice(LOCAL_ENTRIES)
+    pool = entry_text_pool()
+    if pool is None:
+        return ctx.rng.choice(LOCAL_ENTRIES)
+    # Texts are generated ahead of time in the background; a fill that finds
+    # the pool empty uses a canned line rather than waiting on the API.
+    return pool.take() or ctx.rng.choice(FALLBACK_ENTRIES)
 
 
 def generate_entry_text(entry_mode="ai", seed=None):
-    global ENTRY_MODE
-    ENTRY_MODE = entry_mode
-    if seed is not None:
-        random.seed(seed)
-    return get_entry_text()
+    return get_entry_text(FillContext(seed, entry_mode=entry_mode))
 
 
 def run_fill_session(
@@ -311,58 +706,128 @@ def run_fill_session(
     entry_mode="ai",
     entry_text=None,
     log_cb=None,
+    capture_requests=False,
+    fill_plan=None,
+    trace=None,
 ):
-    if seed is not None:
-        random.seed(seed)
+    plan = fill_plan or FillPlan(seed, entry_text)
+    if entry_text is None:
+        entry_text = plan.entry_text
+    ctx = FillContext(seed, mode, entry_mode, entry_text, log_cb, trace)
+    if entry_mode == "ai" and entry_text is None and entry_text_pool() is not None:
+        # Start generating while the browser launches.
+        entry_text_pool().start()
+    recorded = None
+    pooled = DRIVER_POOL is not None and headless
+    started = time.perf_counter()
+
+    def fill(driver):
+        nonlocal recorded, released
+        ctx.trace.add("driver", started, pooled=pooled)
+        recorder = install_recorder(driver) if capture_requests else None
+        fill_pages(driver, url, iterations, min_wait, max_wait, plan, ctx)
+        if recorder is not None:
+            with ctx.trace.span("collect_requests"):
+                recorded = collect_recorded(driver, recorder)
+        report = memory_report(driver)
+        if report:
+            ctx.log(f"Memory: {report}")
+        released = time.perf_counter()
+
+    released = None
+    try:
+        if pooled:
+            with DRIVER_POOL.session([url]) as driver:
+                fill(driver)
+        else:
+            driver = create_driver(headless)
+            try:
+                fill(driver)
+            finally:
+                driver.quit()
+    finally:
+        if released is not None:
+            ctx.trace.add("driver_release", released, pooled=pooled)
+    return recorded
+
+
+def fill_targets(driver, kind, containers, iteration, plan, ctx):
+    # Pairs each container to fill with its planned field actions, or with
+    # None when the batched scripts are unavailable and the per-element
+    # fallback has to be used.
+    metas = extract_fields(driver, containers)
+    if metas is None:
+        chosen = containers if ctx.mode == "all" else [ctx.rng.choice(containers)]
+        return [(container, None) for container in chosen]
+    keys = container_keys(kind, metas)
+    chosen = set(plan.pick_containers(iteration, keys, ctx.mode))
+    return [
+        (container, plan.actions_for(iteration, key, meta["fields"], ctx))
+        for container, meta, key in zip(containers, metas, keys)
+        if key in chosen
+    ]
 
-    global ENTRY_MODE
-    ENTRY_MODE = entry_mode
-    if entry_text is not None:
-        set_entry_text(entry_text)
 
-    driver = create_driver(headless)
+def fill_pages(driver, url, iterations, min_wait, max_wait, plan, ctx):
+    log = ctx.log
+    trace = ctx.trace
     wait = WebDriverWait(driver, 10)
-    log = log_cb or (lambda message: None)
-
-    try:
-        for idx in range(max(iterations, 1)):
-            log(f"Loading {url}")
+    for idx in range(max(iterations, 1)):
+        log(f"Loading {url}")
+        with trace.span("page_load", iteration=idx):
             driver.get(url)
             wait.until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+            track_activity(driver)
+        with trace.span("discover", iteration=idx):
             forms = driver.find_elements(By.TAG_NAME, "form")
-
             if forms:
-                targets = forms if mode == "all" else [random.choice(forms)]
-                log(f"Found {len(forms)} form(s); filling {len(targets)}.")
-                for form in targets:
-                    fill_form(form)
+                targets = fill_targets(driver, "form", forms, idx, plan, ctx)
+            else:
+                rows = driver.find_elements(By.CSS_SELECTOR, ".input-row")
+                targets = fill_targets(driver, "row", rows, idx, plan, ctx) if rows else []
+
+        if forms:
+            log(f"Found {len(forms)} form(s); filling {len(targets)}.")
+            for form, actions in targets:
+                with trace.span("fill", iteration=idx):
+                    filled = fill_container(driver, form, actions, fill_form, ctx)
+                if not filled:
+                    continue
+                with trace.span("submit", iteration=idx):
                     submit_form(form, driver)
-                    log("Submitted form.")
-                    time.sleep(1)
-                continue
-
-            rows = driver.find_elements(By.CSS_SELECTOR, ".input-row")
-            if not rows:
-                log("No forms or input rows found on page.")
-                return
+                log("Submitted form.")
+                with trace.span("settle", iteration=idx):
+                    settled = wait_for_settle(driver)
+                if settled == "timeout":
+                    log(f"Page still busy after {SETTLE_TIMEOUT_SECONDS:g}s; moving on.")
+            continue
 
-            targets = rows if mode == "all" else [random.choice(rows)]
-            log(f"Found {len(rows)} input row(s); filling {len(targets)}.")
-            for row in targets:
-                fill_row(row)
-                time.sleep(0.2)
+        if not rows:
+            log("No forms or input rows found on page.")
+            return
+
+        log(f"Found {len(rows)} input row(s); filling {len(targets)}.")
+        for row, actions in targets:
+            with trace.span("fill", iteration=idx):
+                filled = fill_container(driver, row, actions, fill_row, ctx)
+                if filled:
+                    # Let input handlers (validation, enabling the button) run first.
+                    wait_for_settle(driver, idle_ms=min(SETTLE_IDLE_MS, 50))
+            if not filled:
+                continue
+            with trace.span("submit", iteration=idx):
                 submit_row(row, driver)
-                log("Submitted row.")
-                time.sleep(1)
-
-            if idx < iterations - 1:
-                wait_seconds = random.randint(min_wait, max_wait)
-                log(f"Waiting {wait_seconds}s before next iteration.")
+            log("Submitted row.")
+            with trace.span("settle", iteration=idx):
+                settled = wait_for_settle(driver)
+            if settled == "timeout":
+                log(f"Page still busy after {SETTLE_TIMEOUT_SECONDS:g}s; moving on.")
+
+        if idx < iterations - 1:
+            wait_seconds = ctx.rng.randint(min_wait, max_wait)
+            log(f"Waiting {wait_seconds}s before next iteration.")
+            with trace.span("iteration_wait", iteration=idx):
                 time.sleep(wait_seconds)
-    finally:
-        if entry_text is not None:
-            clear_entry_text()
-        driver.quit()
 
 
 def main():
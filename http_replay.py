@@ -0,0 +1,212 @@
+import json
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlparse
+
+from compare_utils import normalize_base_url
+
+
+RECORDED_KEY = "__fillRequests"
+
+# Installed before any page script runs. Records every state-changing
+# fetch/XHR call plus native (non-JS) form posts, and keeps the list in
+# sessionStorage so it survives the navigation a native submit causes.
+RECORDER_SCRIPT = """
+(function () {
+  if (window.__fillRecorderInstalled) { return; }
+  window.__fillRecorderInstalled = true;
+  var KEY = "%(key)s";
+  function load() {
+    try { return JSON.parse(sessionStorage.getItem(KEY) || "[]"); } catch (e) { return []; }
+  }
+  function save(entry) {
+    var list = load();
+    list.push(entry);
+    try { sessionStorage.setItem(KEY, JSON.stringify(list)); } catch (e) {}
+  }
+  function bodyText(body) {
+    if (body === undefined || body === null) { return null; }
+    if (typeof body === "string") { return body; }
+    if (body instanceof URLSearchParams) { return body.toString(); }
+    if (typeof FormData !== "undefined" && body instanceof FormData) {
+      var params = new URLSearchParams();
+      body.forEach(function (value, key) {
+        if (typeof value === "string") { params.append(key, value); }
+      });
+      return params.toString();
+    }
+    return undefined;
+  }
+  function record(kind, method, url, contentType, body) {
+    method = (method || "GET").toUpperCase();
+    if (method === "GET" || method === "HEAD" || method === "OPTIONS") { return; }
+    var text = bodyText(body);
+    if (text === undefined) { return; }
+    save({
+      kind: kind,
+      method: method,
+      url: new URL(url, location.href).href,
+      content_type: contentType || (text === null ? null : "text/plain;charset=UTF-8"),
+      body: text
+    });
+  }
+  var originalFetch = window.fetch;
+  if (originalFetch) {
+    window.fetch = function (input, init) {
+      try {
+        var request = typeof input === "string" || input instanceof URL ? null : input;
+        var headers = new Headers((init && init.headers) || (request && request.headers) || {});
+        record(
+          "fetch",
+          (init && init.method) || (request && request.method),
+          request ? request.url : String(input),
+          headers.get("content-type"),
+          init ? init.body : null
+        );
+      } catch (e) {}
+      return originalFetch.apply(this, arguments);
+    };
+  }
+  var open = XMLHttpRequest.prototype.open;
+  var setRequestHeader = XMLHttpRequest.prototype.setRequestHeader;
+  var send = XMLHttpRequest.prototype.send;
+  XMLHttpRequest.prototype.open = function (method, url) {
+    this.__fillRequest = { method: method, url: url, contentType: null };
+    return open.apply(this, arguments);
+  };
+  XMLHttpRequest.prototype.setRequestHeader = function (name, value) {
+    if (this.__fillRequest && String(name).toLowerCase() === "content-type") {
+      this.__fillRequest.contentType = value;
+    }
+    return setRequestHeader.apply(this, arguments);
+  };
+  XMLHttpRequest.prototype.send = function (body) {
+    try {
+      var info = this.__fillRequest;
+      if (info) { record("xhr", info.method, info.url, info.contentType, body); }
+    } catch (e) {}
+    return send.apply(this, arguments);
+  };
+  function recordForm(form) {
+    if (!form || form.enctype === "multipart/form-data") { return; }
+    try {
+      record(
+        "form",
+        form.method || "GET",
+        form.action || location.href,
+        "application/x-www-form-urlencoded",
+        new FormData(form)
+      );
+    } catch (e) {}
+  }
+  window.addEventListener("submit", function (event) {
+    if (!event.defaultPrevented) { recordForm(event.target); }
+  });
+  // form.submit() posts without firing a submit event.
+  var formSubmit = HTMLFormElement.prototype.submit;
+  HTMLFormElement.prototype.submit = function () {
+    recordForm(this);
+    return formSubmit.apply(this, arguments);
+  };
+})();
+""" % {"key": RECORDED_KEY}
+
+COLLECT_SCRIPT = "try { return sessionStorage.getItem('%s'); } catch (e) { return null; }" % (
+    RECORDED_KEY
+)
+
+
+class ReplayError(Exception):
+    def __init__(self, message, sent=0):
+        super().__init__(message)
+        self.sent = sent
+
+
+def install_recorder(driver):
+    try:
+        result = driver.execute_cdp_cmd(
+            "Page.addScriptToEvaluateOnNewDocument", {"source": RECORDER_SCRIPT}
+        )
+    except Exception:
+        return None
+    return result.get("identifier")
+
+
+def collect_recorded(driver, identifier):
+    try:
+        raw = driver.execute_script(COLLECT_SCRIPT)
+    except Exception:
+        raw = None
+    try:
+        driver.execute_cdp_cmd(
+            "Page.removeScriptToEvaluateOnNewDocument", {"identifier": identifier}
+        )
+    except Exception:
+        pass
+    try:
+        return json.loads(raw or "[]")
+    except ValueError:
+        return []
+
+
+def build_replay_plan(recorded, baseline_url):
+    # Keep only calls back to the baseline app itself, stored relative to its
+    # base URL the same way compare endpoints are, so they can be re-aimed at
+    # any student's base URL.
+    base = normalize_base_url(baseline_url)
+    base_origin = urlparse(base)
+    plan = []
+    for entry in recorded or []:
+        parsed = urlparse(entry.get("url") or "")
+        if (parsed.scheme, parsed.netloc) != (base_origin.scheme, base_origin.netloc):
+            continue
+        path = parsed.path
+        if base_origin.path and path.startswith(f"{base_origin.path}/"):
+            path = path[len(base_origin.path):]
+        if parsed.query:
+            path = f"{path}?{parsed.query}"
+        plan.append(
+            {
+                "method": entry.get("method") or "POST",
+                "path": path if path.startswith("/") else f"/{path}",
+                "content_type": entry.get("content_type"),
+                "body": entry.get("body"),
+            }
+        )
+    return plan
+
+
+def replay_plan(plan, target_url, timeout=15, log_cb=None, trace=None):
+    log = log_cb or (lambda message: None)
+    base = normalize_base_url(target_url)
+    sent = 0
+    for step in plan:
+        started = time.perf_counter()
+        headers = {}
+        if step.get("content_type"):
+            headers["Content-Type"] = step["content_type"]
+        body = step.get("body")
+        req = urllib.request.Request(
+            f"{base}{step['path']}",
+            data=body.encode("utf-8") if body is not None else None,
+            headers=headers,
+            method=step["method"],
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                status = resp.status
+                resp.read()
+        except urllib.error.HTTPError as exc:
+            if trace is not None:
+                trace.add("request", started, path=step["path"], status=exc.code)
+            raise ReplayError(f"{step['method']} {step['path']} -> {exc.code}", sent)
+        except (urllib.error.URLError, OSError) as exc:
+            if trace is not None:
+                trace.add("request", started, path=step["path"], status=None)
+            raise ReplayError(f"{step['method']} {step['path']}: {exc}", sent)
+        if trace is not None:
+            trace.add("request", started, path=step["path"], status=status)
+        sent += 1
+        log(f"{step['method']} {step['path']} -> {status}")
+    return sent
@@ -0,0 +1,258 @@
+import json
+
+
+PRIORITY_SUBMISSION = 0
+PRIORITY_PERIODIC = 10
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class PermanentJobError(Exception):
+    # Raised by a handler when running the job again would do harm, e.g. a
+    # fill that already submitted data: the job fails without a retry.
+    pass
+
+
+def enqueue_job(
+    conn,
+    kind,
+    payload,
+    now,
+    priority=PRIORITY_PERIODIC,
+    dedup_key=None,
+    batch=None,
+    max_attempts=3,
+    delay=0,
+):
+    # A job already waiting under the same key in the same batch absorbs this
+    # one: it takes the newer payload and the more urgent priority and
+    # availability of the two. Other batches get a job of their own.
+    row = conn.execute(
+        """
+        INSERT INTO jobs (
+            kind, dedup_key, batch, priority, payload, status,
+            attempts, max_attempts, available_at, created_at
+        )
+        VALUES (?, ?, ?, ?, ?, 'queued', 0, ?, ?, ?)
+        ON CONFLICT(dedup_key, COALESCE(batch, '')) WHERE status = 'queued' DO UPDATE SET
+            kind=excluded.kind,
+            payload=excluded.payload,
+            priority=MIN(jobs.priority, excluded.priority),
+            available_at=MIN(jobs.available_at, excluded.available_at),
+            max_attempts=MAX(jobs.max_attempts, excluded.max_attempts)
+        RETURNING id
+        """,
+        (
+            kind,
+            dedup_key,
+            batch,
+            priority,
+            json.dumps(payload),
+            max_attempts,
+            now + delay,
+            now,
+        ),
+    ).fetchone()
+    return row["id"]
+
+
+def running_count(conn, kinds, now):
+    placeholders = ",".join("?" for _ in kinds)
+    row = conn.execute(
+        f"""
+        SELECT COUNT(*) FROM jobs
+        WHERE status = 'running' AND claimed_until >= ? AND kind IN ({placeholders})
+        """,
+        (now, *kinds),
+    ).fetchone()
+    return row[0]
+
+
+def starting_count(conn, kinds, now, window):
+    # Claimed within the last `window` seconds without a warm browser:
+    # likely still launching one.
+    placeholders = ",".join("?" for _ in kinds)
+    row = conn.execute(
+        f"""
+        SELECT COUNT(*) FROM jobs
+        WHERE status = 'running' AND claimed_at >= ? AND kind IN ({placeholders})
+        """,
+        (now - window, *kinds),
+    ).fetchone()
+    return row[0]
+
+
+def claim_job(conn, worker_id, now, visibility_seconds, exclude_kinds=(), launching=True):
+    conn.execute(
+        """
+        UPDATE jobs
+        SET status = 'failed', finished_at = ?, last_error = 'visibility timeout'
+        WHERE status = 'running' AND claimed_until < ? AND attempts >= max_attempts
+        """,
+        (now, now),
+    )
+    # Queued work first, then running jobs whose worker stopped heartbeating.
+    # A key that is still being worked on live is skipped so the same target
+    # is never filled or compared by two workers at once.
+    kind_filter = ""
+    if exclude_kinds:
+        kind_filter = f"AND kind NOT IN ({','.join('?' for _ in exclude_kinds)})"
+    row = conn.execute(
+        f"""
+        SELECT id
+        FROM jobs
+        WHERE (
+                (status = 'queued' AND available_at <= ?)
+                OR (status = 'running' AND claimed_until < ?)
+            )
+            AND (
+                dedup_key IS NULL
+                OR NOT EXISTS (
+                    SELECT 1 FROM jobs AS live
+                    WHERE live.status = 'running'
+                        AND live.dedup_key = jobs.dedup_key
+                        AND live.claimed_until >= ?
+                        AND live.id != jobs.id
+                )
+            )
+            {kind_filter}
+        ORDER BY priority ASC, available_at ASC, id ASC
+        LIMIT 1
+        """,
+        (now, now, now, *exclude_kinds),
+    ).fetchone()
+    if row is None:
+        return None
+    job = conn.execute(
+        """
+        UPDATE jobs
+        SET status = 'running',
+            attempts = attempts + 1,
+            claimed_by = ?,
+            claimed_until = ?,
+            claimed_at = ?
+        WHERE id = ?
+        RETURNING id, kind, dedup_key, batch, priority, payload, attempts, max_attempts
+        """,
+        (worker_id, now + visibility_seconds, now if launching else None, row["id"]),
+    ).fetchone()
+    return dict(job, payload=json.loads(job["payload"]))
+
+
+def extend_job(conn, job_id, worker_id, until):
+    cursor = conn.execute(
+        """
+        UPDATE jobs SET claimed_until = ?
+        WHERE id = ? AND status = 'running' AND claimed_by = ?
+        """,
+        (until, job_id, worker_id),
+    )
+    return cursor.rowcount == 1
+
+
+def complete_job(conn, job_id, worker_id, now):
+    cursor = conn.execute(
+        """
+        UPDATE jobs SET status = 'done', finished_at = ?, claimed_until = NULL
+        WHERE id = ? AND status = 'running' AND claimed_by = ?
+        """,
+        (now, job_id, worker_id),
+    )
+    return cursor.rowcount == 1
+
+
+def fail_job(conn, job_id, worker_id, error, now, retry_delay, retry=True):
+    job = conn.execute(
+        """
+        SELECT dedup_key, batch, attempts, max_attempts
+        FROM jobs
+        WHERE id = ? AND status = 'running' AND claimed_by = ?
+        """,
+        (job_id, worker_id),
+    ).fetchone()
+    if job is None:
+        return None
+    superseded = job["dedup_key"] is not None and conn.execute(
+        """
+        SELECT 1 FROM jobs
+        WHERE dedup_key = ? AND COALESCE(batch, '') = COALESCE(?, '') AND status = 'queued'
+        """,
+        (job["dedup_key"], job["batch"]),
+    ).fetchone()
+    if not retry or job["attempts"] >= job["max_attempts"] or superseded:
+        conn.execute(
+            """
+            UPDATE jobs
+            SET status = 'failed', finished_at = ?, claimed_until = NULL, last_error = ?
+            WHERE id = ?
+            """,
+            (now, error, job_id),
+        )
+        return "failed"
+    # Exponential backoff: retry_delay, 2x, 4x, ... after each failed attempt.
+    conn.execute(
+        """
+        UPDATE jobs
+        SET status = 'queued', claimed_by = NULL, claimed_until = NULL,
+            last_error = ?, available_at = ?
+        WHERE id = ?
+        """,
+        (error, now + retry_delay * 2 ** (job["attempts"] - 1), job_id),
+    )
+    return "queued"
+
+
+def release_job(conn, job_id, worker_id):
+    # Used on shutdown: make the claim visible again right away instead of
+    # waiting out the visibility timeout.
+    conn.execute(
+        """
+        UPDATE jobs SET claimed_until = 0
+        WHERE id = ? AND status = 'running' AND claimed_by = ?
+        """,
+        (job_id, worker_id),
+    )
+
+
+def queued_batch(conn, dedup_key):
+    row = conn.execute(
+        "SELECT batch FROM jobs WHERE dedup_key = ? AND status = 'queued' ORDER BY id LIMIT 1",
+        (dedup_key,),
+    ).fetchone()
+    return row["batch"] if row else None
+
+
+def batch_failed(conn, batch):
+    row = conn.execute(
+        "SELECT COUNT(*) FROM jobs WHERE batch = ? AND status = 'failed'",
+        (batch,),
+    ).fetchone()
+    return row[0]
+
+
+def batch_pending(conn, batch):
+    placeholders = ",".join("?" for _ in ACTIVE_STATUSES)
+    row = conn.execute(
+        f"SELECT COUNT(*) FROM jobs WHERE batch = ? AND status IN ({placeholders})",
+        (batch, *ACTIVE_STATUSES),
+    ).fetchone()
+    return row[0]
+
+
+def queue_counts(conn):
+    rows = conn.execute(
+        """
+        SELECT kind, status, COUNT(*) AS jobs
+        FROM jobs
+        GROUP BY kind, status
+        ORDER BY kind, status
+        """
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def prune_jobs(conn, before):
+    cursor = conn.execute(
+        "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+        (before,),
+    )
+    return cursor.rowcount
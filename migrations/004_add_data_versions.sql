@@ -0,0 +1,24 @@
+CREATE TABLE IF NOT EXISTS data_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO data_versions (name, version) VALUES ('settings', 0);
+
+CREATE TRIGGER IF NOT EXISTS settings_version_insert
+AFTER INSERT ON settings
+BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'settings';
+END;
+
+CREATE TRIGGER IF NOT EXISTS settings_version_update
+AFTER UPDATE ON settings
+BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'settings';
+END;
+
+CREATE TRIGGER IF NOT EXISTS settings_version_delete
+AFTER DELETE ON settings
+BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'settings';
+END;
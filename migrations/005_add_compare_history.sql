@@ -0,0 +1,32 @@
+CREATE TABLE IF NOT EXISTS compare_history_endpoints (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS compare_history (
+    lab TEXT NOT NULL,
+    url TEXT NOT NULL,
+    checked_at INTEGER NOT NULL,
+    status INTEGER NOT NULL,
+    elapsed_ms INTEGER NOT NULL,
+    endpoints TEXT NOT NULL,
+    PRIMARY KEY (lab, url, checked_at)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_compare_history_checked_at
+ON compare_history (checked_at);
+
+CREATE TABLE IF NOT EXISTS compare_history_hourly (
+    lab TEXT NOT NULL,
+    url TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    checks INTEGER NOT NULL,
+    matches INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    total_ms INTEGER NOT NULL,
+    max_ms INTEGER NOT NULL,
+    PRIMARY KEY (lab, url, hour)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_compare_history_hourly_hour
+ON compare_history_hourly (hour);
@@ -0,0 +1,11 @@
+CREATE INDEX IF NOT EXISTS idx_leaderboard_lab_checked
+ON leaderboard (lab, COALESCE(last_checked, 0) DESC, last_checked, name, url, sync);
+
+CREATE INDEX IF NOT EXISTS idx_leaderboard_checked
+ON leaderboard (COALESCE(last_checked, 0) DESC, lab, last_checked, name, url, sync);
+
+CREATE INDEX IF NOT EXISTS idx_students_lab_added
+ON students (lab, added_at DESC, name, url);
+
+CREATE INDEX IF NOT EXISTS idx_students_added
+ON students (added_at DESC, lab, name, url);
@@ -0,0 +1,45 @@
+CREATE TRIGGER IF NOT EXISTS students_version_insert
+AFTER INSERT ON students
+BEGIN
+    INSERT INTO data_versions (name, version) VALUES ('students:' || NEW.lab, 1)
+    ON CONFLICT(name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS students_version_update
+AFTER UPDATE ON students
+BEGIN
+    INSERT INTO data_versions (name, version) VALUES ('students:' || OLD.lab, 1)
+    ON CONFLICT(name) DO UPDATE SET version = version + 1;
+    INSERT INTO data_versions (name, version) VALUES ('students:' || NEW.lab, 1)
+    ON CONFLICT(name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS students_version_delete
+AFTER DELETE ON students
+BEGIN
+    INSERT INTO data_versions (name, version) VALUES ('students:' || OLD.lab, 1)
+    ON CONFLICT(name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS leaderboard_version_insert
+AFTER INSERT ON leaderboard
+BEGIN
+    INSERT INTO data_versions (name, version) VALUES ('leaderboard:' || NEW.lab, 1)
+    ON CONFLICT(name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS leaderboard_version_update
+AFTER UPDATE ON leaderboard
+BEGIN
+    INSERT INTO data_versions (name, version) VALUES ('leaderboard:' || OLD.lab, 1)
+    ON CONFLICT(name) DO UPDATE SET version = version + 1;
+    INSERT INTO data_versions (name, version) VALUES ('leaderboard:' || NEW.lab, 1)
+    ON CONFLICT(name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS leaderboard_version_delete
+AFTER DELETE ON leaderboard
+BEGIN
+    INSERT INTO data_versions (name, version) VALUES ('leaderboard:' || OLD.lab, 1)
+    ON CONFLICT(name) DO UPDATE SET version = version + 1;
+END;
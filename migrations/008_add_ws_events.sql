@@ -0,0 +1,10 @@
+CREATE TABLE IF NOT EXISTS ws_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    lab TEXT,
+    event TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_ws_events_created_at
+ON ws_events (created_at);
@@ -0,0 +1,30 @@
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    dedup_key TEXT,
+    batch TEXT,
+    priority INTEGER NOT NULL DEFAULT 10,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    available_at REAL NOT NULL,
+    claimed_by TEXT,
+    claimed_until REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+
+-- At most one waiting job per target; a second enqueue merges into it.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_dedup_queued
+    ON jobs(dedup_key) WHERE status = 'queued';
+
+CREATE INDEX IF NOT EXISTS idx_jobs_claim
+    ON jobs(status, priority, available_at, id);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_running_key
+    ON jobs(dedup_key, claimed_until) WHERE status = 'running';
+
+CREATE INDEX IF NOT EXISTS idx_jobs_batch
+    ON jobs(batch, status) WHERE batch IS NOT NULL;
@@ -0,0 +1,26 @@
+CREATE TABLE IF NOT EXISTS fill_traces (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    lab_id TEXT NOT NULL,
+    batch TEXT,
+    target_url TEXT NOT NULL,
+    target_name TEXT,
+    engine TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    duration_ms REAL NOT NULL,
+    -- [[phase, start_ms, duration_ms, {attrs}?], ...]
+    spans TEXT NOT NULL,
+    error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_fill_traces_batch
+    ON fill_traces(batch) WHERE batch IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_fill_traces_lab_started
+    ON fill_traces(lab_id, started_at);
+
+CREATE INDEX IF NOT EXISTS idx_fill_traces_target
+    ON fill_traces(lab_id, target_url, started_at);
+
+CREATE INDEX IF NOT EXISTS idx_fill_traces_started
+    ON fill_traces(started_at);
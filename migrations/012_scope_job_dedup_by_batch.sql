@@ -0,0 +1,7 @@
+-- Waiting jobs only merge within one batch. A fill queued by an older cycle
+-- carries that cycle's seed and plan, so a newer cycle queues its own job
+-- for the same target instead of overwriting it.
+DROP INDEX IF EXISTS idx_jobs_dedup_queued;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_dedup_queued
+    ON jobs(dedup_key, COALESCE(batch, '')) WHERE status = 'queued';
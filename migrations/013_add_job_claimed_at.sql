@@ -0,0 +1,4 @@
+-- When the current attempt was claimed, if it has to launch a browser. A fill
+-- claimed moments ago has not started its browser yet, so the memory check
+-- reserves room for it. NULL when the worker had a warm browser waiting.
+ALTER TABLE jobs ADD COLUMN claimed_at REAL;
@@ -0,0 +1,27 @@
+-- History is append-only, but checked_at is in whole seconds: a submission's
+-- compare and a queued one can finish in the same second. seq numbers the
+-- checks of one target within a second, so neither replaces the other.
+BEGIN TRANSACTION;
+
+CREATE TABLE IF NOT EXISTS compare_history_new (
+    lab TEXT NOT NULL,
+    url TEXT NOT NULL,
+    checked_at INTEGER NOT NULL,
+    seq INTEGER NOT NULL DEFAULT 0,
+    status INTEGER NOT NULL,
+    elapsed_ms INTEGER NOT NULL,
+    endpoints TEXT NOT NULL,
+    PRIMARY KEY (lab, url, checked_at, seq)
+) WITHOUT ROWID;
+
+INSERT INTO compare_history_new (lab, url, checked_at, seq, status, elapsed_ms, endpoints)
+SELECT lab, url, checked_at, 0, status, elapsed_ms, endpoints
+FROM compare_history;
+
+DROP TABLE compare_history;
+ALTER TABLE compare_history_new RENAME TO compare_history;
+
+CREATE INDEX IF NOT EXISTS idx_compare_history_checked_at
+ON compare_history (checked_at);
+
+COMMIT;
@@ -25,8 +25,11 @@ const modalDownloads = document.getElementById("modal-downloads");
 const modalDownloadList = document.getElementById("modal-download-list");
 
 let socket;
+let socketOpen = false;
 const MAX_LOG_LINES = 200;
 let autoFillRemaining = null;
+const studentRows = new Map();
+const leaderboardRows = new Map();
 
 function setStatus(message, kind) {
   if (!statusBox) {
@@ -88,29 +91,117 @@ function renderResults(data) {
   });
 }
 
+function renderEmpty(list, message) {
+  list.innerHTML = "";
+  const empty = document.createElement("div");
+  empty.className = "student-card";
+  empty.textContent = message;
+  list.appendChild(empty);
+}
+
+function studentCard(student) {
+  const card = document.createElement("div");
+  card.className = "student-card";
+  const title = document.createElement("strong");
+  title.textContent = student.name;
+  const url = document.createElement("span");
+  url.textContent = student.url;
+  card.appendChild(title);
+  card.appendChild(url);
+  return card;
+}
+
+function leaderboardCard(entry) {
+  const card = document.createElement("div");
+  card.className = "student-card";
+
+  const title = document.createElement("strong");
+  title.textContent = entry.name || "Unknown";
+
+  const url = document.createElement("span");
+  url.textContent = entry.url;
+
+  const status = document.createElement("span");
+  status.className = "sync";
+  if (entry.sync === true) {
+    status.textContent = "In sync";
+  } else if (entry.sync === false) {
+    status.textContent = "Out of sync";
+    status.classList.add("off");
+  } else {
+    status.textContent = "Pending";
+    status.classList.add("pending");
+  }
+
+  card.appendChild(title);
+  card.appendChild(url);
+  card.appendChild(status);
+  return card;
+}
+
+function drawRows(list, rows, sortKey, buildCard, emptyMessage) {
+  if (!rows.size) {
+    renderEmpty(list, emptyMessage);
+    return;
+  }
+  const ordered = Array.from(rows.values()).sort(
+    (a, b) => (b.data[sortKey] || 0) - (a.data[sortKey] || 0)
+  );
+  if (list.firstChild && !list.firstChild.dataset.url) {
+    list.innerHTML = "";
+  }
+  ordered.forEach((row) => {
+    if (!row.card) {
+      row.card = buildCard(row.data);
+      row.card.dataset.url = row.data.url;
+    }
+    list.appendChild(row.card);
+  });
+}
+
+function applyDelta(rows, delta) {
+  (delta.remove || []).forEach((url) => {
+    const row = rows.get(url);
+    if (row && row.card) {
+      row.card.remove();
+    }
+    rows.delete(url);
+  });
+  (delta.upsert || []).forEach((item) => {
+    const row = rows.get(item.url);
+    if (row && row.card) {
+      row.card.remove();
+    }
+    rows.set(item.url, { data: item, card: null });
+  });
+}
+
+function resetRows(rows, items) {
+  rows.clear();
+  items.forEach((item) => rows.set(item.url, { data: item, card: null }));
+}
+
+function drawStudents() {
+  drawRows(studentsList, studentRows, "added_at", studentCard, "No student apps registered yet.");
+}
+
+function drawLeaderboard() {
+  drawRows(
+    leaderboardList,
+    leaderboardRows,
+    "last_checked",
+    leaderboardCard,
+    "No leaderboard entries yet."
+  );
+}
+
 function renderStudents(data) {
   if (!studentsList) {
     return;
   }
   studentsList.innerHTML = "";
-  if (!data.students.length) {
-    const empty = document.createElement("div");
-    empty.className = "student-card";
-    empty.textContent = "No student apps registered yet.";
-    studentsList.appendChild(empty);
-    return;
-  }
-  data.students.forEach((student) => {
-    const card = document.createElement("div");
-    card.className = "student-card";
-    const title = document.createElement("strong");
-    title.textContent = student.name;
-    const url = document.createElement("span");
-    url.textContent = student.url;
-    card.appendChild(title);
-    card.appendChild(url);
-    studentsList.appendChild(card);
-  });
+  resetRows(studentRows, data.students);
+  drawStudents();
 }
 
 function renderLeaderboard(data) {
@@ -118,41 +209,28 @@ function renderLeaderboard(data) {
     return;
   }
   leaderboardList.innerHTML = "";
-  if (!data.leaderboard.length) {
-    const empty = document.createElement("div");
-    empty.className = "student-card";
-    empty.textContent = "No leaderboard entries yet.";
-    leaderboardList.appendChild(empty);
-    return;
-  }
+  resetRows(leaderboardRows, data.leaderboard);
+  drawLeaderboard();
+}
 
-  data.leaderboard.forEach((entry) => {
-    const card = document.createElement("div");
-    card.className = "student-card";
+function isActiveLab(labId) {
+  return !activeLabId || labId === activeLabId;
+}
 
-    const title = document.createElement("strong");
-    title.textContent = entry.name || "Unknown";
-
-    const url = document.createElement("span");
-    url.textContent = entry.url;
-
-    const status = document.createElement("span");
-    status.className = "sync";
-    if (entry.sync === true) {
-      status.textContent = "In sync";
-    } else if (entry.sync === false) {
-      status.textContent = "Out of sync";
-      status.classList.add("off");
-    } else {
-      status.textContent = "Pending";
-      status.classList.add("pending");
-    }
+function applyStudentsDelta(delta) {
+  if (!studentsList || !isActiveLab(delta.lab)) {
+    return;
+  }
+  applyDelta(studentRows, delta);
+  drawStudents();
+}
 
-    card.appendChild(title);
-    card.appendChild(url);
-    card.appendChild(status);
-    leaderboardList.appendChild(card);
-  });
+function applyLeaderboardDelta(delta) {
+  if (!leaderboardList || !isActiveLab(delta.lab)) {
+    return;
+  }
+  applyDelta(leaderboardRows, delta);
+  drawLeaderboard();
 }
 
 async function refreshStudents() {
@@ -220,8 +298,10 @@ if (form) {
       } else {
         setStatus(`Submission saved for ${data.name}.`, "ok");
       }
-      refreshStudents();
-      refreshLeaderboard();
+      if (!socketOpen) {
+        refreshStudents();
+        refreshLeaderboard();
+      }
     } catch (err) {
       setStatus(err.message || "Something went wrong.", "error");
     } finally {
@@ -231,13 +311,21 @@ if (form) {
 }
 
 function addLogLine(message) {
-  if (!logBox) {
+  addLogLines([message]);
+}
+
+function addLogLines(messages) {
+  if (!logBox || !messages.length) {
     return;
   }
-  const line = document.createElement("div");
-  line.className = "log-line";
-  line.textContent = message;
-  logBox.appendChild(line);
+  const fragment = document.createDocumentFragment();
+  messages.slice(-MAX_LOG_LINES).forEach((message) => {
+    const line = document.createElement("div");
+    line.className = "log-line";
+    line.textContent = message;
+    fragment.appendChild(line);
+  });
+  logBox.appendChild(fragment);
   while (logBox.children.length > MAX_LOG_LINES) {
     logBox.removeChild(logBox.firstChild);
   }
@@ -247,14 +335,50 @@ function addLogLine(message) {
   }
 }
 
+function subscriptionMessage() {
+  const events = [];
+  if (logBox) {
+    events.push("fill_log", "fill_start", "fill_done", "fill_error");
+  }
+  if (autoFillTimer || autoFillEntry) {
+    events.push("fill_meta");
+  }
+  if (leaderboardList) {
+    events.push("leaderboard_delta");
+  }
+  if (studentsList) {
+    events.push("students_delta");
+  }
+  return {
+    action: "subscribe",
+    labs: activeLabId ? [activeLabId] : ["*"],
+    events: events.length ? events : ["*"],
+  };
+}
+
 function connectSocket() {
   const protocol = window.location.protocol === "https:" ? "wss" : "ws";
   socket = new WebSocket(`${protocol}://${window.location.host}/ws`);
 
+  socket.addEventListener("open", () => {
+    socketOpen = true;
+    socket.send(JSON.stringify(subscriptionMessage()));
+    // Deltas sent before this connection are lost; resync once (a 304 when
+    // nothing changed), then rely on pushed deltas until the socket drops.
+    refreshStudents();
+    refreshLeaderboard();
+  });
+
   socket.addEventListener("message", (event) => {
     try {
       const data = JSON.parse(event.data);
-      if (data.event === "fill_log") {
+      if (data.event === "leaderboard_delta") {
+        applyLeaderboardDelta(data.payload);
+      } else if (data.event === "students_delta") {
+        applyStudentsDelta(data.payload);
+      } else if (data.event === "fill_log_batch") {
+        addLogLines(data.payload.messages);
+      } else if (data.event === "fill_log") {
         addLogLine(data.payload.message);
       } else if (data.event === "fill_start") {
         addLogLine(data.payload.message);
@@ -286,6 +410,7 @@ function connectSocket() {
   });
 
   socket.addEventListener("close", () => {
+    socketOpen = false;
     setTimeout(connectSocket, 2000);
   });
 }
@@ -304,7 +429,11 @@ function startCompareCountdown() {
     remaining -= 1;
     if (remaining < 0) {
       remaining = intervalSeconds;
-      refreshLeaderboard();
+      if (!socketOpen) {
+        // Fallback polling only; spread clients out so they don't all hit
+        // the server on the same tick.
+        setTimeout(refreshLeaderboard, Math.random() * 5000);
+      }
     }
   };
   tick();
@@ -330,7 +459,7 @@ function startAutoFillCountdown() {
   setInterval(tick, 1000);
 }
 
-if (logBox) {
+if (logBox || leaderboardList || studentsList) {
   connectSocket();
 }
 refreshStudents();
@@ -0,0 +1,21 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# app.py and migrate_db.py read DB_PATH at import time, so point them at a
+# scratch database before any test imports them.
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="verifier-tests-"), "app.db")
+os.environ["JOB_WORKERS"] = "0"
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    import app
+
+    app.init_db()
+    return app
@@ -0,0 +1,35 @@
+import pytest
+
+from compare_history import record_history, target_timeline
+
+
+@pytest.fixture(autouse=True)
+def empty_history(app_module):
+    with app_module.write_db() as conn:
+        conn.execute("DELETE FROM compare_history")
+
+
+def entry(sync, checked_at=1_700_000_000):
+    return {
+        "lab": "lab1",
+        "url": "http://team.example/",
+        "checked_at": checked_at,
+        "sync": sync,
+        "elapsed_ms": 12,
+        "results": [{"endpoint": "/api/items", "status": "match" if sync else "mismatch"}],
+    }
+
+
+def test_checks_in_the_same_second_are_both_kept(app_module):
+    with app_module.write_db() as conn:
+        record_history(conn, [entry(True)])
+        record_history(conn, [entry(False), entry(True, 1_700_000_001)])
+    with app_module.read_db() as conn:
+        timeline = target_timeline(
+            conn, "lab1", "http://team.example/", 1_699_999_999, 1_700_000_002
+        )
+    assert [(point["checked_at"], point["status"]) for point in timeline["points"]] == [
+        (1_700_000_000, "match"),
+        (1_700_000_000, "mismatch"),
+        (1_700_000_001, "match"),
+    ]
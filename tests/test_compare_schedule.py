@@ -0,0 +1,35 @@
+from compare_schedule import CompareSchedule
+
+
+KEY = ("lab1", "http://team.example/")
+
+
+def test_mismatch_after_a_stable_streak_resets_to_the_base_interval():
+    schedule = CompareSchedule(150, 600)
+    schedule.sync_targets({KEY: "Team"}, 0)
+    schedule.record_result(KEY, True, 1, 1)
+    for checked_at in (10, 20, 30):
+        schedule.record_result(KEY, True, checked_at, checked_at)
+    assert schedule.targets[KEY]["interval"] == 600
+
+    # The periodic compare is queued while the target still matches; queuing
+    # it must not change the interval.
+    schedule.defer(KEY, 700)
+    assert schedule.targets[KEY]["interval"] == 600
+    assert schedule.next_due() == 1300
+
+    # Its result is a mismatch: back to the base interval right away.
+    assert schedule.record_result(KEY, False, 705, 706) == 150
+    assert schedule.next_due() == 856
+    assert schedule.pop_due(856) == [KEY]
+
+
+def test_only_new_results_are_observed():
+    schedule = CompareSchedule(150, 600)
+    schedule.sync_targets({KEY: "Team"}, 0)
+    # The first result seen sets the starting point without rescheduling.
+    assert schedule.record_result(KEY, True, 5, 5) is None
+    assert schedule.record_result(KEY, True, 5, 60) is None
+    assert schedule.record_result(KEY, True, 90, 90) == 300
+    assert schedule.record_result(KEY, True, None, 100) is None
+    assert schedule.record_result(("lab1", "http://gone.example/"), True, 1, 1) is None
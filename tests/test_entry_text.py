@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import entry_text
+
+
+@pytest.fixture
+def stub_api():
+    # An OpenAI-compatible stub: `fail` answers 500 that many times first,
+    # `delay` holds each response back, `hits` records request times.
+    state = {"fail": 0, "delay": 0, "hits": []}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            state["hits"].append(time.monotonic())
+            time.sleep(state["delay"])
+            if state["fail"] > 0:
+                state["fail"] -= 1
+                self.send_response(500)
+                self.end_headers()
+                return
+            body = json.dumps(
+                {"choices": [{"message": {"content": f"Entry number {len(state['hits'])}."}}]}
+            ).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state["url"] = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def shared_pool(monkeypatch, tmp_path, stub_api):
+    # Build the module's shared pool from ENTRY_TEXT_API_URL, as a fill would.
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setenv("ENTRY_TEXT_API_URL", stub_api["url"])
+    monkeypatch.setenv("ENTRY_TEXT_POOL_SIZE", "2")
+    monkeypatch.setattr(entry_text, "shared_pool", None)
+    monkeypatch.setattr(entry_text, "pool_configured", False)
+    monkeypatch.setattr(entry_text, "loaded_env_paths", set())
+    pool = entry_text.entry_text_pool()
+    yield pool
+    pool.shutdown()
+
+
+def wait_until(check, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if check():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_take_does_not_wait_on_the_api(shared_pool, stub_api):
+    stub_api["delay"] = 1
+    started = time.monotonic()
+    assert shared_pool.take() is None
+    assert time.monotonic() - started < 0.5
+    assert shared_pool.stats()["missed"] == 1
+
+
+def test_pool_refills_after_take(shared_pool, stub_api):
+    shared_pool.start()
+    assert wait_until(lambda: shared_pool.stats()["ready"] == 2)
+    text = shared_pool.take()
+    assert text.startswith("Entry number")
+    assert wait_until(lambda: shared_pool.stats()["generated"] == 3)
+    assert shared_pool.stats()["ready"] == 2
+    assert len(stub_api["hits"]) == 3
+
+
+def test_expired_texts_are_dropped():
+    release = threading.Event()
+    pool = entry_text.EntryTextPool(lambda: release.wait(5) and "fresh", size=1, ttl=60)
+    pool.ready.append(("stale", time.time() - 120))
+    try:
+        assert pool.take() is None
+        assert pool.stats()["expired"] == 1
+        release.set()
+        assert wait_until(lambda: pool.stats()["ready"] == 1)
+        assert pool.take() == "fresh"
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_failed_generation_backs_off(stub_api):
+    stub_api["fail"] = 3
+    pool = entry_text.EntryTextPool(
+        lambda: entry_text.request_entry_text(stub_api["url"], "", timeout=5),
+        size=1,
+        retry_seconds=0.1,
+    )
+    try:
+        pool.start()
+        assert wait_until(lambda: pool.stats()["ready"] == 1)
+        hits = stub_api["hits"]
+        gaps = [later - earlier for earlier, later in zip(hits, hits[1:])]
+        assert pool.stats()["errors"] == 3
+        # Retries wait 0.1s, 0.2s, then 0.4s.
+        assert gaps[0] >= 0.1 and gaps[1] >= 0.2 and gaps[2] >= 0.4
+    finally:
+        pool.shutdown()
+
+
+def test_idle_pool_stops_generating_until_used():
+    calls = []
+    pool = entry_text.EntryTextPool(
+        lambda: calls.append(1) or "text", size=1, ttl=0.2, idle_seconds=0.1
+    )
+    try:
+        pool.start()
+        assert wait_until(lambda: len(calls) == 1)
+        # The text expires while nothing takes from the pool: no regeneration.
+        time.sleep(1.5)
+        assert len(calls) == 1
+        assert pool.stats()["idle"]
+        assert pool.take() is None
+        assert wait_until(lambda: len(calls) == 2)
+    finally:
+        pool.shutdown()
+
+
+def test_env_file_is_read_once(monkeypatch, tmp_path):
+    monkeypatch.setattr(entry_text, "loaded_env_paths", set())
+    monkeypatch.delenv("ENTRY_TEXT_TEST_KEY", raising=False)
+    path = tmp_path / ".env"
+    path.write_text("ENTRY_TEXT_TEST_KEY=first\n", encoding="utf-8")
+    entry_text.load_env(str(path))
+    assert os.environ["ENTRY_TEXT_TEST_KEY"] == "first"
+
+    monkeypatch.delenv("ENTRY_TEXT_TEST_KEY")
+    path.write_text("ENTRY_TEXT_TEST_KEY=second\n", encoding="utf-8")
+    entry_text.load_env(str(path))
+    assert "ENTRY_TEXT_TEST_KEY" not in os.environ
@@ -0,0 +1,149 @@
+import time
+
+import pytest
+
+from fill_traces import (
+    FillTrace,
+    cycle_stats,
+    decode_spans,
+    encode_spans,
+    list_fill_traces,
+    percentile,
+    record_fill_trace,
+)
+from job_queue import claim_job, enqueue_job
+
+
+@pytest.fixture(autouse=True)
+def empty_tables(app_module):
+    with app_module.write_db() as conn:
+        conn.execute("DELETE FROM fill_traces")
+        conn.execute("DELETE FROM jobs")
+
+
+def make_trace(started_at, spans):
+    trace = FillTrace()
+    trace.started_at = started_at
+    trace.spans = spans
+    return trace
+
+
+def test_spans_round_trip():
+    spans = [
+        {"name": "page_load", "start_ms": 0.0, "duration_ms": 120.5, "iteration": 0},
+        {"name": "request", "start_ms": 130.0, "duration_ms": 8.2, "path": "/add", "status": 200},
+        {"name": "driver", "start_ms": 0.0, "duration_ms": 900.0},
+    ]
+    raw = encode_spans(spans)
+    assert raw.startswith('[["page_load",0.0,120.5,{"iteration":0}]')
+    assert decode_spans(raw) == spans
+    assert decode_spans(None) == []
+
+
+def test_percentile_is_nearest_rank():
+    assert percentile([], 0.5) is None
+    assert percentile([7], 0.95) == 7
+    assert percentile([2, 1], 0.5) == 1
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.95) == 95
+    assert percentile(values, 1.0) == 100
+    assert percentile(values, 0.0) == 1
+
+
+def test_cycle_stats_of_an_empty_batch():
+    stats = cycle_stats([])
+    assert stats["fills"] == 0
+    assert stats["errors"] == 0
+    assert stats["started_at"] is None
+    assert stats["wall_ms"] is None
+    assert stats["fill_ms"]["count"] == 0
+    assert stats["fill_ms"]["p95_ms"] is None
+    assert stats["engines"] == {}
+    assert stats["phases"] == {}
+
+
+def seed_traces(app_module):
+    lab = app_module.DEFAULT_LAB_ID
+    with app_module.write_db() as conn:
+        for index, (batch, url, engine) in enumerate(
+            [
+                ("cycle-a", "http://a.example/", "browser"),
+                ("cycle-a", "http://b.example/", "http"),
+                ("cycle-b", "http://a.example/", "browser"),
+            ]
+        ):
+            trace = make_trace(
+                1_700_000_000 + index,
+                [{"name": "fill", "start_ms": 0.0, "duration_ms": 100.0 * (index + 1)}],
+            )
+            record_fill_trace(conn, lab, batch, url, url, engine, trace)
+        record_fill_trace(
+            conn, lab, "cycle-b", "http://b.example/", "b", "http",
+            make_trace(1_700_000_010, []), error="boom",
+        )
+    return lab
+
+
+def test_fill_traces_endpoint_batch(app_module):
+    lab = seed_traces(app_module)
+    response = app_module.app.test_client().get(f"/api/fill-traces?lab={lab}&batch=cycle-a")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["batch"] == "cycle-a"
+    assert {trace["url"] for trace in data["traces"]} == {
+        "http://a.example/",
+        "http://b.example/",
+    }
+    assert data["stats"]["fills"] == 2
+    assert set(data["stats"]["engines"]) == {"browser", "http"}
+    assert data["stats"]["phases"]["fill"]["max_ms"] == 200.0
+
+
+def test_fill_traces_endpoint_url_and_limit(app_module):
+    lab = seed_traces(app_module)
+    client = app_module.app.test_client()
+    data = client.get(f"/api/fill-traces?lab={lab}&url=http://a.example/").get_json()
+    assert [trace["batch"] for trace in data["traces"]] == ["cycle-b", "cycle-a"]
+
+    data = client.get(f"/api/fill-traces?lab={lab}&url=http://a.example/&limit=1").get_json()
+    assert [trace["batch"] for trace in data["traces"]] == ["cycle-b"]
+
+    data = client.get(f"/api/fill-traces?lab={lab}&limit=1").get_json()
+    assert [cycle["batch"] for cycle in data["cycles"]] == ["cycle-b"]
+    assert data["cycles"][0]["errors"] == 1
+
+    data = client.get(f"/api/fill-traces?lab={lab}").get_json()
+    assert [cycle["batch"] for cycle in data["cycles"]] == ["cycle-b", "cycle-a"]
+
+    response = client.get(f"/api/fill-traces?lab={lab}&limit=many")
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "limit must be a number."
+    assert client.get("/api/fill-traces?lab=no-such-lab").status_code == 400
+
+
+def test_list_fill_traces_clamps_to_limit(app_module):
+    lab = seed_traces(app_module)
+    with app_module.read_db() as conn:
+        assert len(list_fill_traces(conn, lab, limit=2)) == 2
+        assert len(list_fill_traces(conn, lab, batch="cycle-b")) == 2
+
+
+def test_broken_cycle_stats_do_not_block_fill_done(app_module, monkeypatch):
+    events = []
+
+    def broken_stats(lab_id, batch):
+        raise ValueError("bad trace")
+
+    monkeypatch.setattr(app_module, "log_cycle_stats", broken_stats)
+    monkeypatch.setattr(
+        app_module, "broadcast", lambda event, data, lab=None: events.append(event)
+    )
+    now = time.time()
+    with app_module.write_db() as conn:
+        enqueue_job(
+            conn, "fill", {"lab": app_module.DEFAULT_LAB_ID}, now, dedup_key="fill:x", batch="c1"
+        )
+        job = claim_job(conn, "w1", now, 60)
+    app_module.finish_job(job, "w1")
+    assert events == ["fill_done"]
@@ -0,0 +1,89 @@
+import time
+
+import pytest
+
+from job_queue import (
+    batch_failed,
+    batch_pending,
+    claim_job,
+    enqueue_job,
+    fail_job,
+    queued_batch,
+    starting_count,
+)
+
+
+@pytest.fixture(autouse=True)
+def empty_queue(app_module):
+    with app_module.write_db() as conn:
+        conn.execute("DELETE FROM jobs")
+
+
+def queued(conn, dedup_key):
+    return conn.execute(
+        "SELECT batch, payload FROM jobs WHERE dedup_key = ? AND status = 'queued' ORDER BY id",
+        (dedup_key,),
+    ).fetchall()
+
+
+def test_dedup_merges_within_a_batch_only(app_module):
+    now = time.time()
+    with app_module.write_db() as conn:
+        enqueue_job(conn, "fill", {"seed": 1}, now, dedup_key="fill:t:a", batch="b1")
+        enqueue_job(conn, "fill", {"seed": 2}, now, dedup_key="fill:t:a", batch="b1")
+        enqueue_job(conn, "fill", {"seed": 3}, now, dedup_key="fill:t:a", batch="b2")
+        rows = queued(conn, "fill:t:a")
+        assert [(row["batch"], row["payload"]) for row in rows] == [
+            ("b1", '{"seed": 2}'),
+            ("b2", '{"seed": 3}'),
+        ]
+        assert queued_batch(conn, "fill:t:a") == "b1"
+
+
+def test_unbatched_jobs_still_dedup(app_module):
+    now = time.time()
+    with app_module.write_db() as conn:
+        first = enqueue_job(conn, "compare", {}, now, dedup_key="compare:t:a")
+        second = enqueue_job(conn, "compare", {}, now, dedup_key="compare:t:a")
+        assert first == second
+
+
+def test_permanent_failure_skips_retry_and_marks_batch_failed(app_module):
+    now = time.time()
+    with app_module.write_db() as conn:
+        enqueue_job(conn, "fill", {}, now, dedup_key="fill:t:b", batch="b3", max_attempts=3)
+        job = claim_job(conn, "w1", now, 60)
+        assert job["batch"] == "b3"
+        assert fail_job(conn, job["id"], "w1", "boom", now, 30, retry=False) == "failed"
+        assert batch_pending(conn, "b3") == 0
+        assert batch_failed(conn, "b3") == 1
+
+
+def test_recent_fill_claims_count_as_starting(app_module):
+    now = time.time()
+    with app_module.write_db() as conn:
+        enqueue_job(conn, "fill", {}, now - 60, dedup_key="fill:t:c", batch="b4")
+        enqueue_job(conn, "fill", {}, now, dedup_key="fill:t:d", batch="b4")
+        claim_job(conn, "w1", now - 60, 600)
+        claim_job(conn, "w2", now, 600)
+        assert starting_count(conn, ("fill",), now, 30) == 1
+        assert starting_count(conn, ("fill",), now, 90) == 2
+        assert starting_count(conn, ("compare",), now, 90) == 0
+
+
+def test_memory_check_reserves_room_for_starting_fills(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "FILL_BROWSER_MEMORY_MB", 400)
+    monkeypatch.setattr(app_module, "available_memory_mb", lambda: 1000)
+    assert app_module.low_memory_reason(0) is None
+    assert app_module.low_memory_reason(1) is None
+    assert "1200 MB needed" in app_module.low_memory_reason(2)
+
+
+def test_fills_on_a_warm_browser_are_not_counted_as_starting(app_module):
+    now = time.time()
+    with app_module.write_db() as conn:
+        enqueue_job(conn, "fill", {}, now, dedup_key="fill:t:e", batch="b5")
+        enqueue_job(conn, "fill", {}, now, dedup_key="fill:t:f", batch="b5")
+        claim_job(conn, "w1", now, 600, launching=False)
+        claim_job(conn, "w2", now, 600)
+        assert starting_count(conn, ("fill",), now, 30) == 1
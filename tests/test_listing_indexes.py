@@ -0,0 +1,75 @@
+import sqlite3
+
+import pytest
+
+
+LABS = 40
+ROWS_PER_LAB = 300
+
+
+@pytest.fixture(scope="module")
+def seeded(app_module):
+    # 12k rows per table across 40 labs, some never checked (NULL
+    # last_checked), so the planner sees a realistic spread.
+    leaderboard = []
+    students = []
+    for lab_index in range(LABS):
+        lab = f"plan-lab-{lab_index}"
+        for row in range(ROWS_PER_LAB):
+            url = f"http://team{row}.example/{lab}"
+            checked = None if row % 7 == 0 else 1_700_000_000 + row
+            leaderboard.append((lab, url, f"Team {row}", checked, row % 2))
+            students.append((lab, url, f"Team {row}", 1_700_000_000 + row))
+    with app_module.write_db() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO leaderboard (lab, url, name, last_checked, sync) "
+            "VALUES (?, ?, ?, ?, ?)",
+            leaderboard,
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO students (lab, url, name, added_at) VALUES (?, ?, ?, ?)",
+            students,
+        )
+        conn.execute("ANALYZE")
+    return app_module
+
+
+def captured_queries(app_module, monkeypatch, call):
+    # Record the SQL the listing function actually runs (with its bound
+    # values expanded) so the plan check can't drift from the code.
+    statements = []
+    get_db = app_module.get_db
+
+    def tracing_get_db():
+        conn = get_db()
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(app_module, "get_db", tracing_get_db)
+    call()
+    return [sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+
+
+def query_plan(app_module, sql):
+    conn = sqlite3.connect(app_module.DB_PATH)
+    try:
+        return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()]
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize(
+    "listing, lab",
+    [
+        ("list_leaderboard", "plan-lab-3"),
+        ("list_leaderboard", None),
+        ("list_students", "plan-lab-3"),
+        ("list_students", None),
+    ],
+)
+def test_listing_queries_use_covering_index_without_sort(seeded, monkeypatch, listing, lab):
+    queries = captured_queries(seeded, monkeypatch, lambda: getattr(seeded, listing)(lab))
+    assert len(queries) == 1
+    plan = query_plan(seeded, queries[0])
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+    assert any("COVERING INDEX" in step for step in plan), plan
@@ -0,0 +1,36 @@
+MB = 1024 * 1024
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def test_cgroup_v2_excludes_inactive_page_cache(app_module, tmp_path):
+    write(tmp_path / "memory.max", f"{2048 * MB}\n")
+    write(tmp_path / "memory.current", f"{1900 * MB}\n")
+    write(
+        tmp_path / "memory.stat",
+        f"anon {700 * MB}\nfile {1200 * MB}\nactive_file {300 * MB}\n"
+        f"inactive_file {900 * MB}\n",
+    )
+    assert app_module.read_memory_limit_mb(str(tmp_path)) == 2048 - 1000
+
+
+def test_cgroup_v1_excludes_total_inactive_file(app_module, tmp_path):
+    write(tmp_path / "memory" / "memory.limit_in_bytes", f"{1024 * MB}\n")
+    write(tmp_path / "memory" / "memory.usage_in_bytes", f"{1000 * MB}\n")
+    write(
+        tmp_path / "memory" / "memory.stat",
+        f"inactive_file {10 * MB}\ntotal_inactive_file {600 * MB}\n",
+    )
+    assert app_module.read_memory_limit_mb(str(tmp_path)) == 1024 - 400
+
+
+def test_cgroup_without_stat_or_limit(app_module, tmp_path):
+    write(tmp_path / "memory.max", "max\n")
+    write(tmp_path / "memory.current", f"{100 * MB}\n")
+    assert app_module.read_memory_limit_mb(str(tmp_path)) is None
+
+    write(tmp_path / "memory.max", f"{512 * MB}\n")
+    assert app_module.read_memory_limit_mb(str(tmp_path)) == 412
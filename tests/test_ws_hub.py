@@ -0,0 +1,45 @@
+import json
+import threading
+import time
+
+from ws_hub import BroadcastHub
+
+
+class FakeClient:
+    def __init__(self):
+        self.messages = []
+
+    def send(self, message):
+        self.messages.append(json.loads(message)["event"])
+
+    def close(self):
+        pass
+
+
+def test_fill_done_waits_for_a_batch_flush_in_progress():
+    hub = BroadcastHub(batch_ms=60_000)
+    client = FakeClient()
+    hub.add(client)
+    hub.publish("fill_log", {"message": "filled"}, lab="lab1")
+
+    # Stall the timer thread's flush after it has taken the pending batch.
+    send = hub._send
+    started = threading.Event()
+
+    def slow_send(event, payload, lab, topic=None):
+        if event.endswith("_batch"):
+            started.set()
+            time.sleep(0.2)
+        return send(event, payload, lab, topic)
+
+    hub._send = slow_send
+    flusher = threading.Thread(target=hub.flush_batches)
+    flusher.start()
+    assert started.wait(1)
+    hub.publish("fill_done", {"message": "done"}, lab="lab1")
+    flusher.join()
+
+    deadline = time.monotonic() + 1
+    while len(client.messages) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert client.messages == ["fill_log_batch", "fill_done"]
@@ -0,0 +1,250 @@
+import json
+import threading
+import time
+from collections import deque
+
+
+WILDCARD = "*"
+DROP_OLDEST = "drop_oldest"
+DISCONNECT = "disconnect"
+
+
+class ClientChannel:
+    def __init__(self, client, max_queue, policy, on_close):
+        self.client = client
+        self.max_queue = max(1, max_queue)
+        self.policy = policy
+        self.on_close = on_close
+        self.queue = deque()
+        self.cond = threading.Condition()
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def offer(self, message):
+        with self.cond:
+            if self.closed:
+                return False
+            if len(self.queue) >= self.max_queue:
+                if self.policy == DISCONNECT:
+                    self.dropped += len(self.queue) + 1
+                    self.queue.clear()
+                    self.closed = True
+                    self.cond.notify()
+                    return False
+                self.queue.popleft()
+                self.dropped += 1
+            self.queue.append(message)
+            self.cond.notify()
+        return True
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.queue and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    break
+                message = self.queue.popleft()
+            try:
+                self.client.send(message)
+            except Exception:
+                break
+            self.sent += 1
+        with self.cond:
+            self.closed = True
+            self.queue.clear()
+        try:
+            # Unblocks the handler's receive() so the socket is torn down.
+            self.client.close()
+        except Exception:
+            pass
+        self.on_close(self)
+
+
+class BroadcastHub:
+    def __init__(
+        self,
+        max_queue=256,
+        policy=DROP_OLDEST,
+        batch_events=("fill_log",),
+        batch_ms=250,
+        batch_lines=50,
+    ):
+        self.max_queue = max_queue
+        self.policy = policy if policy in (DROP_OLDEST, DISCONNECT) else DROP_OLDEST
+        self.lock = threading.Lock()
+        self.topics = {}
+        self.client_topics = {}
+        self.channels = {}
+        self.dropped_total = 0
+        self.disconnected_total = 0
+        self.batch_events = set(batch_events) if batch_ms > 0 else set()
+        self.batch_ms = batch_ms
+        self.batch_lines = max(1, batch_lines)
+        # Held while pending batches are flushed and while any unbatched
+        # event is enqueued, so client queues see events in publish order.
+        self.batch_lock = threading.Lock()
+        self.batches = {}
+        self.batch_thread = None
+
+    def add(self, client):
+        channel = ClientChannel(client, self.max_queue, self.policy, self._channel_closed)
+        with self.lock:
+            self.channels[client] = channel
+        self.subscribe(client, [WILDCARD], [WILDCARD])
+        channel.start()
+
+    def subscribe(self, client, labs, events):
+        labs = [lab for lab in labs or [] if isinstance(lab, str) and lab] or [WILDCARD]
+        events = [event for event in events or [] if isinstance(event, str) and event] or [
+            WILDCARD
+        ]
+        keys = {(lab, event) for lab in labs for event in events}
+        with self.lock:
+            if client not in self.channels:
+                return
+            self._unsubscribe(client)
+            self.client_topics[client] = keys
+            for key in keys:
+                self.topics.setdefault(key, set()).add(client)
+
+    def remove(self, client):
+        with self.lock:
+            self._unsubscribe(client)
+            channel = self.channels.pop(client, None)
+        if channel is not None:
+            self._retire(channel)
+            channel.close()
+
+    def _channel_closed(self, channel):
+        with self.lock:
+            if self.channels.get(channel.client) is not channel:
+                return
+            self._unsubscribe(channel.client)
+            del self.channels[channel.client]
+            self.disconnected_total += 1
+        self._retire(channel)
+
+    def _retire(self, channel):
+        with self.lock:
+            self.dropped_total += channel.dropped
+            channel.dropped = 0
+
+    def _unsubscribe(self, client):
+        for key in self.client_topics.pop(client, ()):
+            subscribers = self.topics.get(key)
+            if subscribers is None:
+                continue
+            subscribers.discard(client)
+            if not subscribers:
+                del self.topics[key]
+
+    def subscribers(self, event, lab=None):
+        with self.lock:
+            if lab is None:
+                # Events without a lab go to everyone listening for that event.
+                clients = {
+                    client
+                    for (_, topic_event), subscribed in self.topics.items()
+                    if topic_event in (event, WILDCARD)
+                    for client in subscribed
+                }
+            else:
+                clients = set()
+                for key in ((lab, event), (lab, WILDCARD), (WILDCARD, event), (WILDCARD, WILDCARD)):
+                    clients.update(self.topics.get(key, ()))
+            return [self.channels[client] for client in clients if client in self.channels]
+
+    def publish(self, event, payload, lab=None):
+        if event in self.batch_events:
+            self._add_to_batch(event, payload, lab)
+            return 0
+        # Anything queued for this lab goes out first so a fill_done never
+        # overtakes the log lines that preceded it, even if the timer thread
+        # is flushing them at the same moment.
+        with self.batch_lock:
+            self._flush_locked(lab)
+            return self._send(event, payload, lab)
+
+    def _send(self, event, payload, lab, topic=None):
+        # Producers only serialize and enqueue; each client's writer thread
+        # does the network I/O, so a stalled browser never blocks the caller.
+        channels = self.subscribers(topic or event, lab)
+        if not channels:
+            return 0
+        message = json.dumps({"event": event, "lab": lab, "payload": payload})
+        return sum(1 for channel in channels if channel.offer(message))
+
+    def _add_to_batch(self, event, payload, lab):
+        with self.batch_lock:
+            batch = self.batches.setdefault((lab, event), [])
+            batch.append(payload)
+            full = len(batch) >= self.batch_lines
+            if self.batch_thread is None:
+                self.batch_thread = threading.Thread(target=self._run_batch_flusher, daemon=True)
+                self.batch_thread.start()
+        if full:
+            self.flush_batches(lab, event)
+
+    def flush_batches(self, lab=None, event=None):
+        with self.batch_lock:
+            self._flush_locked(lab, event)
+
+    def _flush_locked(self, lab=None, event=None):
+        keys = [
+            key
+            for key in self.batches
+            if (lab is None or key[0] == lab) and (event is None or key[1] == event)
+        ]
+        pending = [(key, self.batches.pop(key)) for key in keys]
+        for (batch_lab, batch_event), payloads in pending:
+            self._send(
+                f"{batch_event}_batch",
+                {"messages": [payload.get("message") for payload in payloads]},
+                batch_lab,
+                topic=batch_event,
+            )
+
+    def _run_batch_flusher(self):
+        while True:
+            time.sleep(self.batch_ms / 1000)
+            self.flush_batches()
+
+    def handle_message(self, client, raw_message):
+        try:
+            message = json.loads(raw_message)
+        except (TypeError, ValueError):
+            return False
+        if not isinstance(message, dict) or message.get("action") != "subscribe":
+            return False
+        labs = message.get("labs")
+        events = message.get("events")
+        if not isinstance(labs, list) or not isinstance(events, list):
+            return False
+        self.subscribe(client, labs, events)
+        return True
+
+    def stats(self):
+        with self.lock:
+            channels = list(self.channels.values())
+            dropped = self.dropped_total
+            disconnected = self.disconnected_total
+        return {
+            "clients": len(channels),
+            "queued": sum(len(channel.queue) for channel in channels),
+            "sent": sum(channel.sent for channel in channels),
+            "dropped": dropped + sum(channel.dropped for channel in channels),
+            "slow_disconnects": disconnected,
+            "policy": self.policy,
+            "max_queue": self.max_queue,
+        }